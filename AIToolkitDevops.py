@@ -7,7 +7,10 @@ import re
 import asyncio
 import json
 import os
-from typing import Dict, Optional
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable, Dict, Optional
+from collections import OrderedDict
 from contextlib import AsyncExitStack
 
 from mcp import ClientSession, StdioServerParameters
@@ -20,6 +23,206 @@ from azure.ai.inference import ChatCompletionsClient
 from azure.ai.inference.models import AssistantMessage, SystemMessage, UserMessage, ToolMessage
 from azure.ai.inference.models import ImageContentItem, ImageUrl, TextContentItem
 from azure.core.credentials import AzureKeyCredential
+from azure.core.exceptions import HttpResponseError
+from azure.core.pipeline.policies import RetryPolicy
+
+from admission import INTERACTIVE, AdmissionController, estimate_tokens, retry_after_seconds
+from mcp_gateway import GatewaySession, TTLCache, is_cacheable
+from model_tiers import LARGE, SMALL, ModelTier, complexity_reasons, self_escalated, tier_costs_from_env, with_small_tier_prompt
+from tool_compaction import compact_tool_result, content_text
+
+# How many times a single model round-trip is retried after a 429
+MAX_RATE_LIMIT_RETRIES = 3
+
+
+class ModelRetryPolicy(RetryPolicy):
+    """azure-core's retry policy without 429s.
+
+    The SDK would otherwise sleep through up to 10 rate-limit responses inside the calling
+    thread before `_complete` sees one. Until then admissions would not pause and the rate
+    would not be halved. Connection errors and 5xx are still retried here.
+    """
+
+    def is_retry(self, settings, response) -> bool:
+        if response.http_response.status_code == 429:
+            return False
+        return super().is_retry(settings, response)
+
+DEFAULT_AZURE_AI_ENDPOINT = "https://prd-generator-workflow-resource.openai.azure.com/openai/deployments/gpt-4.1"
+DEFAULT_AZURE_AI_MODEL = "gpt-4.1"
+
+# "sprint insights [for|of] <name>", the name ending at punctuation or trailing filler ("... please")
+SPRINT_INSIGHT_PATTERN = re.compile(
+    r"sprint insights?\s*(?:(?:for|of)\s+)?([\w\-]+(?:\s+[\w\-]+)*?)?"
+    r"(?=\s*(?:[.,;:!?)]|$|\b(?:please|pls|thanks|thank you|for me|now|today|asap)\b))"
+)
+
+
+SYSTEM_PROMPT = "You are an Azure DevOps Operations Agent with access to Azure DevOps MCP tools.\nYour responsibility is to retrieve, manage, and create Azure DevOps resources using the available MCP tool actions only.\nYou must:\nUse MCP tools for all Azure DevOps interactions\nNever fabricate data\nAlways confirm required identifiers before performing write actions\n\nResponse Format\nAlways respond in the following structure:\nAction Summary\nWhat operation is being performed\nResolved Identifiers\nProject ID\nTeam ID (if applicable)\nIdentity ID (if applicable)\nTool Invocation\nMCP tool name\nParameters passed\nResult\nSuccess or failure\nReturned data in a readable format"
+
+
+def _env_number(name: str, cast, default):
+    """Read a numeric limit from the environment; ``0`` or ``none`` disables it."""
+    raw = os.environ.get(name)
+    if raw is None or raw.strip() == "":
+        return default
+    if raw.strip().lower() in ("0", "none", "off"):
+        return None
+    try:
+        return cast(raw)
+    except ValueError:
+        return default
+
+
+@dataclass
+class ChatBudget:
+    """Limits for a single chatWithTools conversation. ``None`` disables a limit."""
+    max_iterations: Optional[int] = 8
+    max_total_tokens: Optional[int] = 60000
+    max_seconds: Optional[float] = 90.0
+
+    @classmethod
+    def from_env(cls) -> "ChatBudget":
+        """Build a budget from CHAT_MAX_ITERATIONS, CHAT_MAX_TOKENS and CHAT_MAX_SECONDS."""
+        defaults = cls()
+        return cls(
+            max_iterations=_env_number("CHAT_MAX_ITERATIONS", int, defaults.max_iterations),
+            max_total_tokens=_env_number("CHAT_MAX_TOKENS", int, defaults.max_total_tokens),
+            max_seconds=_env_number("CHAT_MAX_SECONDS", float, defaults.max_seconds),
+        )
+
+    def exceeded(self, stats: "ConversationStats") -> Optional[str]:
+        """Return the reason the budget is exhausted, or None if there is room left."""
+        if self.max_iterations is not None and len(stats.iterations) >= self.max_iterations:
+            return f"iteration limit of {self.max_iterations} reached"
+        if self.max_total_tokens is not None and stats.total_tokens >= self.max_total_tokens:
+            return f"token limit of {self.max_total_tokens} reached"
+        if self.max_seconds is not None and stats.elapsed >= self.max_seconds:
+            return f"time limit of {self.max_seconds:g}s reached"
+        return None
+
+
+@dataclass
+class ConversationStats:
+    """Token and latency accounting for one chatWithTools conversation."""
+    prompt_key: str
+    started: float = field(default_factory=time.perf_counter)
+    iterations: list = field(default_factory=list)
+    stop_reason: Optional[str] = None
+    # Why the conversation ran on (or moved to) the large tier while a small tier was available
+    escalation: Optional[str] = None
+
+    def record(self, prompt_tokens: int, completion_tokens: int, model_latency: float, tool_latency: float, tool_calls: list[str],
+               admission_wait: float = 0.0, tier: str = LARGE, cost: float = 0.0):
+        self.iterations.append({
+            "iteration": len(self.iterations) + 1,
+            "tier": tier,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "model_latency": round(model_latency, 3),
+            "tool_latency": round(tool_latency, 3),
+            "admission_wait": round(admission_wait, 3),
+            "cost": round(cost, 6),
+            "tool_calls": tool_calls,
+        })
+
+    @property
+    def prompt_tokens(self) -> int:
+        return sum(it["prompt_tokens"] for it in self.iterations)
+
+    @property
+    def completion_tokens(self) -> int:
+        return sum(it["completion_tokens"] for it in self.iterations)
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    @property
+    def cost(self) -> float:
+        return sum(it["cost"] for it in self.iterations)
+
+    def tier_split(self) -> dict:
+        """Model calls, tokens, latency and cost per tier."""
+        split = {}
+        for it in self.iterations:
+            agg = split.setdefault(it["tier"], {"calls": 0, "promptTokens": 0, "completionTokens": 0, "modelLatency": 0.0, "cost": 0.0})
+            agg["calls"] += 1
+            agg["promptTokens"] += it["prompt_tokens"]
+            agg["completionTokens"] += it["completion_tokens"]
+            agg["modelLatency"] = round(agg["modelLatency"] + it["model_latency"], 3)
+            agg["cost"] = round(agg["cost"] + it["cost"], 6)
+        return split
+
+    def to_dict(self) -> dict:
+        return {
+            "prompt": self.prompt_key,
+            "promptTokens": self.prompt_tokens,
+            "completionTokens": self.completion_tokens,
+            "modelLatency": round(sum(it["model_latency"] for it in self.iterations), 3),
+            "toolLatency": round(sum(it["tool_latency"] for it in self.iterations), 3),
+            "elapsed": round(self.elapsed, 3),
+            "cost": round(self.cost, 6),
+            "stopReason": self.stop_reason,
+            "escalation": self.escalation,
+            "tiers": self.tier_split(),
+            "iterations": self.iterations,
+        }
+
+
+@dataclass
+class ToolOutcome:
+    """One tool call made by the deterministic insight path."""
+    tool: str
+    args: dict
+    status: str  # "ok", "error" or "unavailable"
+    cache: str  # "hit", "miss" or "bypass" (not cacheable / not called)
+    seconds: float
+    data: Any = None
+    error: Optional[str] = None
+
+
+@dataclass
+class InsightResult:
+    """JSON-serializable answer from handle_insight_intent."""
+    intent: str
+    params: dict
+    tools: list = field(default_factory=list)
+    missing: Optional[str] = None
+    seconds: float = 0.0
+
+    @property
+    def complete(self) -> bool:
+        return self.missing is None and bool(self.tools) and all(t.status == "ok" for t in self.tools)
+
+    def to_dict(self) -> dict:
+        return {**asdict(self), "complete": self.complete}
+
+
+def parse_tool_content(content) -> Any:
+    """JSON payload of a tool result's text content, or the text itself when it is not JSON."""
+    text = content_text(content)
+    try:
+        return json.loads(text)
+    except (TypeError, ValueError):
+        return text
+
+
+def prompt_key_from_messages(messages: list) -> str:
+    """Identify a conversation by the text of its last user message (trimmed for grouping)."""
+    for message in reversed(messages):
+        if not isinstance(message, UserMessage):
+            continue
+        content = message.content
+        if isinstance(content, list):
+            content = " ".join(getattr(item, "text", "") or "" for item in content)
+        return " ".join(str(content).split())[:120]
+    return "<no user message>"
+
 
 class MCPClient:
 
@@ -48,43 +251,72 @@ class MCPClient:
                 print("Raw response:", response)
                 return None
 
-        async def handle_insight_intent(self, user_prompts):
+        async def _call_insight_tool(self, tool: str, args: dict) -> ToolOutcome:
+            """Run one insight tool call, serving read-only results from a short TTL cache."""
+            started = time.perf_counter()
+            if tool not in self._tool_to_server_map:
+                return ToolOutcome(tool, args, "unavailable", "bypass", 0.0)
+            server_id = self._tool_to_server_map[tool]
+            session = self._servers[server_id]["session"]
+            if isinstance(session, GatewaySession):
+                # The gateway caches read-only calls itself; a local miss could be a gateway hit
+                cacheable, cache_status = False, "gateway"
+            else:
+                cacheable = self.insight_cache_ttl > 0 and is_cacheable(tool)
+                cache_status = "miss" if cacheable else "bypass"
+            key = (tool, json.dumps(args, sort_keys=True, default=str))
+            hit = self._insight_cache.get(key) if cacheable else None
+            if hit is not None:
+                return ToolOutcome(tool, args, "ok", "hit", round(time.perf_counter() - started, 3), data=hit)
+            try:
+                res = await session.call_tool(tool, args)
+            except Exception as e:
+                return ToolOutcome(tool, args, "error", cache_status, round(time.perf_counter() - started, 3), error=str(e))
+            data = parse_tool_content(res.content)
+            if getattr(res, "isError", False):
+                return ToolOutcome(tool, args, "error", cache_status, round(time.perf_counter() - started, 3), error=str(data))
+            if cacheable:
+                self._insight_cache.put(key, data)
+            return ToolOutcome(tool, args, "ok", cache_status, round(time.perf_counter() - started, 3), data=data)
+
+        async def _run_insight(self, intent: str, params: dict, tool_calls: list[tuple[str, dict]]) -> InsightResult:
+            """Issue all of an intent's tool calls concurrently and collect typed outcomes."""
+            started = time.perf_counter()
+            outcomes = await asyncio.gather(*(self._call_insight_tool(tool, args) for tool, args in tool_calls))
+            result = InsightResult(intent, params, list(outcomes), seconds=round(time.perf_counter() - started, 3))
+            print(f"\n[AI {intent}] {len(outcomes)} tool calls in {result.seconds:.2f}s")
+            for outcome in outcomes:
+                print(f"  {outcome.tool}: {outcome.status} ({outcome.cache}, {outcome.seconds:.2f}s)")
+            return result
+
+        async def handle_insight_intent(self, user_prompts, interactive: bool = False) -> Optional[InsightResult]:
             """
             Detects user intent and orchestrates MCP tool calls for:
             1. Sprint Insight (velocity, capacity, progress)
             2. Code Review Insights (PR patterns, review efficiency)
             3. Sprint Planning Support (AI recommendations)
             4. Real-time Metrics (KPIs)
-            Returns True if handled, else False.
+            Each intent's tool calls run concurrently. Returns an InsightResult if handled, else None.
+            Missing parameters are prompted for only when `interactive` (CLI); otherwise the
+            result names what is missing and no tools are called.
             """
             # Lowercase all prompts for intent matching
             prompt_text = " ".join(user_prompts).lower()
             # Sprint insight
-            sprint_match = re.search(r"sprint insight.*?(?:for|of)?\s*([\w\- ]+)?", prompt_text)
+            sprint_match = SPRINT_INSIGHT_PATTERN.search(prompt_text)
             if sprint_match or "velocity" in prompt_text or "capacity" in prompt_text or "work progress" in prompt_text:
                 sprint_name = sprint_match.group(1).strip() if sprint_match and sprint_match.group(1) else None
                 print("[AI] Sprint Insight requested.")
-                if not sprint_name:
+                if not sprint_name and interactive:
                     sprint_name = input("Enter sprint name: ").strip()
+                if not sprint_name:
+                    return InsightResult("Sprint Insight", {}, missing="sprint")
                 # Example tool names (replace with actual MCP tool names as needed)
-                tool_calls = [
+                return await self._run_insight("Sprint Insight", {"sprint": sprint_name}, [
                     ("g-azure-devops-boards_get_sprint_velocity", {"sprint": sprint_name}),
                     ("g-azure-devops-boards_get_sprint_capacity", {"sprint": sprint_name}),
                     ("g-azure-devops-boards_get_sprint_progress", {"sprint": sprint_name}),
-                ]
-                results = {}
-                for tool, args in tool_calls:
-                    if tool in self._tool_to_server_map:
-                        server_id = self._tool_to_server_map[tool]
-                        session = self._servers[server_id]["session"]
-                        res = await session.call_tool(tool, args)
-                        results[tool] = res.content
-                print("\n[AI Sprint Insight]")
-                print(f"Sprint: {sprint_name}")
-                print(f"Velocity: {results.get('g-azure-devops-boards_get_sprint_velocity')}")
-                print(f"Capacity: {results.get('g-azure-devops-boards_get_sprint_capacity')}")
-                print(f"Progress: {results.get('g-azure-devops-boards_get_sprint_progress')}")
-                return True
+                ])
 
             # Code Review Insights
             if "code review" in prompt_text or "pull request" in prompt_text or "review efficiency" in prompt_text:
@@ -94,73 +326,60 @@ class MCPClient:
                 if not project_match:
                     project_match = re.search(r"(?:in|for|at)\s+([\w\-]+)", prompt_text)
                 project = project_match.group(1) if project_match else None
-                if not project:
+                if not project and interactive:
                     project = input("Enter project name for code review insights: ").strip()
-                tool_calls = [
+                if not project:
+                    return InsightResult("Code Review Insights", {}, missing="project")
+                return await self._run_insight("Code Review Insights", {"project": project}, [
                     ("g-azure-devops-repos_list_pull_requests", {"project": project, "status": "all"}),
                     ("g-azure-devops-repos_get_review_stats", {"project": project}),
-                ]
-                print(f"[DEBUG] Using project name: '{project}' (type: {type(project)})")
-                results = {}
-                for tool, args in tool_calls:
-                    print(f"[DEBUG] Calling tool: {tool} with args: {args}")
-                    if tool in self._tool_to_server_map:
-                        server_id = self._tool_to_server_map[tool]
-                        session = self._servers[server_id]["session"]
-                        res = await session.call_tool(tool, args)
-                        print(f"[DEBUG] Raw response from {tool}: type={type(res.content)}, value={res.content}")
-                        results[tool] = res.content
-                    else:
-                        print(f"[DEBUG] Tool {tool} not found in tool-to-server map.")
-                print("\n[AI Code Review Insights]")
-                pr_list = results.get('g-azure-devops-repos_list_pull_requests')
-                review_stats = results.get('g-azure-devops-repos_get_review_stats')
-                if pr_list and pr_list != 'None' and pr_list != '[]':
-                    print(f"Pull Request Patterns: {pr_list}")
-                else:
-                    print("No pull requests found for project:", project)
-                if review_stats and review_stats != 'None' and review_stats != '{}':
-                    print(f"Review Efficiency: {review_stats}")
-                else:
-                    print("No review stats found for project:", project)
-                return True
+                ])
 
             # Sprint Planning Support
             if "sprint planning" in prompt_text or "planning support" in prompt_text or "ai recommend" in prompt_text or "scope" in prompt_text or "priorit" in prompt_text:
                 print("[AI] Sprint Planning Support requested.")
-                tool = "g-azure-devops-boards_get_sprint_planning_recommendations"
-                args = {}
-                if tool in self._tool_to_server_map:
-                    server_id = self._tool_to_server_map[tool]
-                    session = self._servers[server_id]["session"]
-                    res = await session.call_tool(tool, args)
-                    print("\n[AI Sprint Planning Recommendations]")
-                    print(res.content)
-                else:
-                    print("[AI] Planning tool not available.")
-                return True
+                return await self._run_insight("Sprint Planning Recommendations", {}, [
+                    ("g-azure-devops-boards_get_sprint_planning_recommendations", {}),
+                ])
 
             # Real-time Metrics
             if "real-time metric" in prompt_text or "kpi" in prompt_text or "performance indicator" in prompt_text:
                 print("[AI] Real-time Metrics requested.")
-                tool = "g-azure-devops-boards_get_realtime_kpis"
-                args = {}
-                if tool in self._tool_to_server_map:
-                    server_id = self._tool_to_server_map[tool]
-                    session = self._servers[server_id]["session"]
-                    res = await session.call_tool(tool, args)
-                    print("\n[AI Real-time KPIs]")
-                    print(res.content)
-                else:
-                    print("[AI] KPI tool not available.")
-                return True
+                return await self._run_insight("Real-time KPIs", {}, [
+                    ("g-azure-devops-boards_get_realtime_kpis", {}),
+                ])
 
-            return False
-        def __init__(self):
+            return None
+        def __init__(self, budget: Optional[ChatBudget] = None, tiers: Optional[Dict[str, ModelTier]] = None):
             # Initialize session and client objects
             self._servers = {}
             self._tool_to_server_map = {}
             self.exit_stack = AsyncExitStack()
+            self.budget = budget or ChatBudget.from_env()
+            # Shared TPM/RPM admission control for every model call made by this client
+            self.admission = AdmissionController.from_env()
+            # Aggregated token/latency usage keyed by prompt text
+            # Keys are user text from the public API, so only the most recently seen prompts are kept
+            self._usage_by_prompt: "OrderedDict[str, dict]" = OrderedDict()
+            self.usage_max_prompts = int(os.environ.get("USAGE_MAX_PROMPTS", "500"))
+            self._usage_evicted = 0
+            # Per-tier totals survive eviction of the per-prompt rows
+            self._tier_totals: Dict[str, dict] = {}
+            self.last_conversation: Optional[ConversationStats] = None
+            # Cap on the compacted tool result text fed back to the model
+            self.tool_result_max_chars = int(os.environ.get("TOOL_RESULT_MAX_CHARS", "12000"))
+            # Per-tool raw vs. compacted result sizes (characters)
+            self._tool_result_stats: Dict[str, dict] = {}
+            # Short-lived cache of read-only tool results used by handle_insight_intent
+            # (bypassed for gateway sessions, which share the gateway's own cache)
+            self.insight_cache_ttl = float(os.environ.get("INSIGHT_CACHE_TTL", "60"))
+            self._insight_cache = TTLCache(self.insight_cache_ttl, int(os.environ.get("INSIGHT_CACHE_MAX_ENTRIES", "256")))
+            # Model deployments by tier ("large", optionally "small"); pass `tiers` to use other completion clients
+            self.tiers = tiers or self._tiers_from_env()
+            self.azureai = self.tiers[LARGE].client
+
+        def _tiers_from_env(self) -> Dict[str, ModelTier]:
+            """Large tier from AZURE_AI_ENDPOINT / AZURE_AI_MODEL; a small tier when AZURE_AI_SMALL_MODEL is set."""
             # To authenticate with the model you will need to generate a personal access token (PAT) in your GitHub settings.
             # Create your PAT token by following instructions here: https://docs.github.com/en/authentication/keeping-your-account-and-data-secure/managing-your-personal-access-tokens
             # Attempt to load a local .env for developer convenience if python-dotenv is installed.
@@ -177,11 +396,24 @@ class MCPClient:
                     "AZURE_AI_API_KEY is not set. Set the environment variable or create a .env file with AZURE_AI_API_KEY=<key>."
                 )
 
-            self.azureai = ChatCompletionsClient(
-                endpoint = "https://prd-generator-workflow-resource.openai.azure.com/openai/deployments/gpt-4.1",
-                credential = AzureKeyCredential(azure_key),
-                api_version = "2025-01-01-preview",
-            )
+            def client(endpoint):
+                return ChatCompletionsClient(
+                    endpoint = endpoint,
+                    credential = AzureKeyCredential(azure_key),
+                    api_version = "2025-01-01-preview",
+                    # 429s go straight to _complete, so the admission controller owns rate-limit backoff
+                    retry_policy = ModelRetryPolicy(),
+                )
+
+            # Default prices are gpt-4.1 / gpt-4.1-mini list prices per 1k tokens
+            endpoint = os.environ.get("AZURE_AI_ENDPOINT", DEFAULT_AZURE_AI_ENDPOINT)
+            tiers = {LARGE: ModelTier(LARGE, os.environ.get("AZURE_AI_MODEL", DEFAULT_AZURE_AI_MODEL), client(endpoint),
+                                      *tier_costs_from_env(LARGE, 0.002, 0.008))}
+            small_model = os.environ.get("AZURE_AI_SMALL_MODEL")
+            if small_model:
+                small_endpoint = os.environ.get("AZURE_AI_SMALL_ENDPOINT") or endpoint.rsplit("/deployments/", 1)[0] + "/deployments/" + small_model
+                tiers[SMALL] = ModelTier(SMALL, small_model, client(small_endpoint), *tier_costs_from_env(SMALL, 0.0004, 0.0016))
+            return tiers
 
         async def connect_stdio_server(self, server_id: str, command: str, args: list[str], env: Dict[str, str]):
             """Connect to an MCP server using STDIO transport
@@ -238,6 +470,20 @@ class MCPClient:
             # Register the server
             await self._register_server(server_id, session)
         
+        async def connect_gateway(self, server_id: str, socket_path: str):
+            """Connect to an MCP server through a shared gateway process (see mcp_gateway.py)
+            
+            Args:
+                server_id: Server identifier registered in the gateway
+                socket_path: Unix socket the gateway listens on
+            """
+            session = GatewaySession(server_id, socket_path)
+            await session.connect()
+            self.exit_stack.push_async_callback(session.close)
+            
+            # Register the server
+            await self._register_server(server_id, session)
+        
         async def _register_server(self, server_id: str, session: ClientSession):
             """Register a server and its tools in the client
             
@@ -261,10 +507,140 @@ class MCPClient:
                 
             print(f"\nConnected to server '{server_id}' with tools:", [tool.name for tool in tools])
 
-        async def chatWithTools(self, messages: list[any]) -> str:
+        def _record_usage(self, stats: ConversationStats):
+            """Fold a finished conversation into the per-prompt aggregates."""
+            agg = self._usage_by_prompt.setdefault(stats.prompt_key, {
+                "prompt": stats.prompt_key,
+                "conversations": 0,
+                "iterations": 0,
+                "promptTokens": 0,
+                "completionTokens": 0,
+                "modelLatency": 0.0,
+                "toolLatency": 0.0,
+                "cost": 0.0,
+                "budgetStops": 0,
+                "escalations": 0,
+                "tiers": {},
+            })
+            agg["conversations"] += 1
+            agg["iterations"] += len(stats.iterations)
+            agg["promptTokens"] += stats.prompt_tokens
+            agg["completionTokens"] += stats.completion_tokens
+            agg["modelLatency"] = round(agg["modelLatency"] + sum(it["model_latency"] for it in stats.iterations), 3)
+            agg["toolLatency"] = round(agg["toolLatency"] + sum(it["tool_latency"] for it in stats.iterations), 3)
+            agg["cost"] = round(agg["cost"] + stats.cost, 6)
+            if stats.stop_reason:
+                agg["budgetStops"] += 1
+            if stats.escalation:
+                agg["escalations"] += 1
+            for tier, split in stats.tier_split().items():
+                for target in (agg["tiers"], self._tier_totals):
+                    tier_agg = target.setdefault(tier, {"calls": 0, "promptTokens": 0, "completionTokens": 0, "modelLatency": 0.0, "cost": 0.0})
+                    for key, value in split.items():
+                        tier_agg[key] = round(tier_agg[key] + value, 6)
+            self._usage_by_prompt.move_to_end(stats.prompt_key)
+            while len(self._usage_by_prompt) > self.usage_max_prompts:
+                self._usage_by_prompt.popitem(last=False)
+                self._usage_evicted += 1
+            self.last_conversation = stats
+
+        def _compact_result(self, tool_name: str, content) -> str:
+            """Model-facing text for a tool result, recording the size reduction per tool."""
+            raw_chars = len(str(content))
+            compact = compact_tool_result(tool_name, content, self.tool_result_max_chars)
+            agg = self._tool_result_stats.setdefault(tool_name, {"tool": tool_name, "calls": 0, "rawChars": 0, "compactChars": 0})
+            agg["calls"] += 1
+            agg["rawChars"] += raw_chars
+            agg["compactChars"] += len(compact)
+            return compact
+
+        def get_tool_result_stats(self) -> list[dict]:
+            """Raw vs. compacted tool result sizes per tool, largest savings first."""
+            rows = []
+            for agg in self._tool_result_stats.values():
+                row = dict(agg)
+                row["reduction"] = round(1 - row["compactChars"] / row["rawChars"], 3) if row["rawChars"] else 0
+                rows.append(row)
+            return sorted(rows, key=lambda r: r["rawChars"] - r["compactChars"], reverse=True)
+
+        def get_tier_stats(self) -> dict:
+            """Model calls, tokens, latency and cost per tier across all conversations."""
+            totals = {name: {"model": tier.model, "calls": 0, "promptTokens": 0, "completionTokens": 0, "modelLatency": 0.0, "cost": 0.0}
+                      for name, tier in self.tiers.items()}
+            for name, split in self._tier_totals.items():
+                row = totals.setdefault(name, {"model": None, "calls": 0, "promptTokens": 0, "completionTokens": 0, "modelLatency": 0.0, "cost": 0.0})
+                for key, value in split.items():
+                    row[key] = round(row[key] + value, 6)
+            for row in totals.values():
+                row["avgLatency"] = round(row["modelLatency"] / row["calls"], 3) if row["calls"] else None
+            return totals
+
+        def get_usage_stats(self) -> list[dict]:
+            """Aggregated usage per prompt, most expensive (by total tokens) first.
+
+            Only the `usage_max_prompts` most recently used prompts are tracked.
+            """
+            rows = []
+            for agg in self._usage_by_prompt.values():
+                row = dict(agg)
+                row["totalTokens"] = row["promptTokens"] + row["completionTokens"]
+                row["avgTokensPerConversation"] = round(row["totalTokens"] / row["conversations"], 1)
+                rows.append(row)
+            return sorted(rows, key=lambda r: r["totalTokens"], reverse=True)
+
+        async def _complete(self, tier: ModelTier, messages: list, tools: list, priority: int):
+            """One admitted model call on `tier`, retried on 429. Returns (response, latency, admission wait)."""
+            estimated = estimate_tokens(messages, tools)
+            admission_wait = 0.0
+            for attempt in range(MAX_RATE_LIMIT_RETRIES + 1):
+                ticket = await self.admission.acquire(estimated, priority)
+                admission_wait += ticket.waited
+                model_started = time.perf_counter()
+                try:
+                    response = await asyncio.to_thread(
+                        tier.client.complete,
+                        messages = messages,
+                        model = tier.model,
+                        tools=tools,
+                    )
+                    break
+                except HttpResponseError as e:
+                    retry_after = retry_after_seconds(e)
+                    if retry_after is None or attempt == MAX_RATE_LIMIT_RETRIES:
+                        raise
+                    self.admission.on_rate_limited(retry_after, ticket)
+                    print(f"[Admission] 429 from model, retrying after {retry_after:.1f}s")
+            model_latency = time.perf_counter() - model_started
+            usage = getattr(response, "usage", None)
+            actual = (getattr(usage, "prompt_tokens", 0) or 0) + (getattr(usage, "completion_tokens", 0) or 0) if usage else None
+            self.admission.settle(ticket, actual)
+            return response, model_latency, admission_wait
+
+        @staticmethod
+        def _escalation_reason(message, tool_rounds: int) -> Optional[str]:
+            """Why a small-tier reply should be handed to the large tier, or None to keep it."""
+            if not message.tool_calls:
+                return "small model asked to escalate" if self_escalated(message.content) else None
+            if tool_rounds >= 1:
+                return "needed a second round of tool calls"
+            for call in message.tool_calls:
+                try:
+                    json.loads(call.function.arguments)
+                except (TypeError, ValueError):
+                    return f"invalid arguments for {call.function.name}"
+            return None
+
+        async def chatWithTools(self, messages: list[any], progress: Optional[Callable[[str], None]] = None, priority: int = INTERACTIVE) -> str:
             """Chat with model and using tools
             Args:
                 messages: Messages to send to the model
+                progress: Optional callback receiving short status lines (model round-trips, tool calls)
+                priority: Admission priority for model calls (admission.INTERACTIVE or admission.BACKGROUND)
+
+            The loop stops when the model answers without requesting tools, or when
+            ``self.budget`` (iterations, tokens, wall time) is exhausted; in the latter
+            case a summary assistant message is appended instead of another round-trip.
+            Returns the final assistant text.
             """
             if not self._servers:
                 raise ValueError("No MCP servers connected. Connect to at least one server first.")
@@ -282,14 +658,44 @@ class MCPClient:
                         },
                     })
 
+            stats = ConversationStats(prompt_key=prompt_key_from_messages(messages))
+            final_text = ""
+
+            # Start on the small tier unless the prompt already looks like large-model work
+            tier_name = LARGE
+            if SMALL in self.tiers:
+                reasons = complexity_reasons(messages)
+                if reasons:
+                    stats.escalation = "complexity: " + "; ".join(reasons)
+                else:
+                    tier_name = SMALL
+            tool_rounds = 0
+
             while True:
+                tier = self.tiers[tier_name]
 
-                # Call model
-                response = self.azureai.complete(
-                    messages = messages,
-                    model = "gpt-4.1",
-                    tools=available_tools,
-                )
+                # Call model (the SDK client is synchronous; keep the event loop free for other requests)
+                if progress:
+                    progress(f"Model round-trip {len(stats.iterations) + 1} ({tier.name} model)")
+                request_messages = with_small_tier_prompt(messages) if tier_name == SMALL else messages
+                response, model_latency, admission_wait = await self._complete(tier, request_messages, available_tools, priority)
+                usage = getattr(response, "usage", None)
+                prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+                completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+                cost = tier.cost(prompt_tokens, completion_tokens)
+
+                if tier_name == SMALL:
+                    escalation = self._escalation_reason(response.choices[0].message, tool_rounds)
+                    if escalation:
+                        # Discard the small model's reply; the large model redoes this round
+                        stats.record(prompt_tokens, completion_tokens, model_latency, 0.0, [], admission_wait, SMALL, cost)
+                        stats.escalation = escalation
+                        tier_name = LARGE
+                        print(f"[Tiers] Escalating to {self.tiers[LARGE].model}: {escalation}")
+                        continue
+
+                tool_latency = 0.0
+                called_tools = []
                 hasToolCall = False
 
                 if response.choices[0].message.tool_calls:
@@ -297,6 +703,7 @@ class MCPClient:
                         hasToolCall = True
                         tool_name = tool.function.name
                         tool_args = json.loads(tool.function.arguments)
+                        called_tools.append(tool_name)
                         messages.append(
                             AssistantMessage(
                                 tool_calls = [{
@@ -317,25 +724,50 @@ class MCPClient:
                             server_session = self._servers[server_id]["session"]
                             
                             # Execute tool call on the appropriate server
+                            if progress:
+                                progress(f"Calling tool {tool_name}")
+                            tool_started = time.perf_counter()
                             result = await server_session.call_tool(tool_name, tool_args)
+                            tool_latency += time.perf_counter() - tool_started
                             print(f"[Server '{server_id}' call tool '{tool_name}' with args {tool_args}]: {result.content}")
 
                             messages.append(
                                 ToolMessage(
                                     tool_call_id = tool.id,
-                                    content = str(result.content)
+                                    content = self._compact_result(tool_name, result.content)
                                 )
                             )
                 else:
+                    final_text = response.choices[0].message.content or ""
                     messages.append(
                         AssistantMessage(
-                            content = response.choices[0].message.content
+                            content = final_text
                         )
                     )
-                    print(f"[Model Response]: {response.choices[0].message.content}")
+                    print(f"[Model Response]: {final_text}")
+
+                stats.record(prompt_tokens, completion_tokens, model_latency, tool_latency, called_tools, admission_wait, tier_name, cost)
+                print(f"[Usage] iteration {len(stats.iterations)} ({tier.model}): prompt={prompt_tokens} completion={completion_tokens} model={model_latency:.2f}s tools={tool_latency:.2f}s")
             
                 if not hasToolCall:
                     break
+                tool_rounds += 1
+
+                stop_reason = self.budget.exceeded(stats)
+                if stop_reason:
+                    stats.stop_reason = stop_reason
+                    final_text = (
+                        f"Stopped before completing the request: {stop_reason}. "
+                        f"Used {len(stats.iterations)} model round-trips, {stats.prompt_tokens} prompt tokens, "
+                        f"{stats.completion_tokens} completion tokens in {stats.elapsed:.1f}s. "
+                        f"Tools called: {', '.join(t for it in stats.iterations for t in it['tool_calls']) or 'none'}."
+                    )
+                    messages.append(AssistantMessage(content = final_text))
+                    print(f"[Budget] {final_text}")
+                    break
+
+            self._record_usage(stats)
+            return final_text
         
         async def cleanup(self):
             """Clean up resources"""
@@ -370,7 +802,7 @@ async def main():
     client = MCPClient()
 
     messages = [
-        SystemMessage(content = "You are an Azure DevOps Operations Agent with access to Azure DevOps MCP tools.\nYour responsibility is to retrieve, manage, and create Azure DevOps resources using the available MCP tool actions only.\nYou must:\nUse MCP tools for all Azure DevOps interactions\nNever fabricate data\nAlways confirm required identifiers before performing write actions\n\nResponse Format\nAlways respond in the following structure:\nAction Summary\nWhat operation is being performed\nResolved Identifiers\nProject ID\nTeam ID (if applicable)\nIdentity ID (if applicable)\nTool Invocation\nMCP tool name\nParameters passed\nResult\nSuccess or failure\nReturned data in a readable format")
+        SystemMessage(content = SYSTEM_PROMPT)
     ]
 
     for prompt in user_prompts:
@@ -388,8 +820,10 @@ async def main():
             }
         )
         # Try to handle with insight orchestrator first
-        handled = await client.handle_insight_intent(user_prompts)
-        if not handled:
+        insight = await client.handle_insight_intent(user_prompts, interactive=True)
+        if insight:
+            print(json.dumps(insight.to_dict(), indent=2, default=str))
+        else:
             await client.chatWithTools(messages)
     except Exception as e:
         print(f"\nError: {str(e)}")
@@ -1,7 +1,7 @@
 import axios from 'axios';
 
 // In a real app, this would come from process.env.VITE_API_BASE_URL
-const API_BASE_URL = 'http://localhost:8000/api';
+export const API_BASE_URL = 'http://localhost:8000/api';
 
 export const apiClient = axios.create({
   baseURL: API_BASE_URL,
@@ -1,6 +1,7 @@
 
+import { useEffect } from 'react';
 import { useQuery, useMutation, useQueryClient } from '@tanstack/react-query';
-import { apiClient } from './api';
+import { apiClient, API_BASE_URL } from './api';
 import { Sprint, SprintInsights, PRAnalytics, KPI, QueryResponse } from '../types';
 
 export const useSprints = () => {
@@ -38,22 +39,48 @@ export const usePRAnalytics = () => {
 };
 
 export const useKPIs = () => {
+  const queryClient = useQueryClient();
+
+  // Server pushes a snapshot on connect, then only changed KPIs
+  useEffect(() => {
+    const source = new EventSource(`${API_BASE_URL}/kpis/stream`);
+    source.addEventListener('snapshot', (event) => {
+      const { kpis } = JSON.parse((event as MessageEvent).data);
+      queryClient.setQueryData<KPI[]>(['kpis'], kpis);
+    });
+    source.addEventListener('diff', (event) => {
+      const { changed, removed } = JSON.parse((event as MessageEvent).data);
+      queryClient.setQueryData<KPI[]>(['kpis'], (current = []) => {
+        const byId = new Map(current.map((kpi) => [kpi.id, kpi]));
+        (changed as KPI[]).forEach((kpi) => byId.set(kpi.id, kpi));
+        (removed as string[]).forEach((id) => byId.delete(id));
+        return Array.from(byId.values());
+      });
+    });
+    return () => source.close();
+  }, [queryClient]);
+
   return useQuery<KPI[]>({
     queryKey: ['kpis'],
     queryFn: async () => {
       const { data } = await apiClient.get('/kpis');
       return data;
     },
-    staleTime: 30 * 1000,
-    refetchInterval: 30 * 1000, // Real-time refresh
+    staleTime: Infinity, // Kept current by the KPI stream
   });
 };
 
 export const useDevOpsQuery = () => {
   return useMutation<QueryResponse, Error, string>({
     mutationFn: async (query: string) => {
-      const { data } = await apiClient.post('/query', { query });
-      return data;
+      // The backend queues the question as a job; poll until a worker finishes it
+      const { data: job } = await apiClient.post('/query', { query });
+      for (;;) {
+        const { data } = await apiClient.get(`/query/${job.jobId}`);
+        if (data.status === 'succeeded') return data.result;
+        if (data.status === 'failed') throw new Error(data.error || 'Query failed');
+        await new Promise((resolve) => setTimeout(resolve, 1000));
+      }
     },
   });
 };
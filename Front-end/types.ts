@@ -23,7 +23,7 @@ export interface PRAnalytics {
   approvalRate: number;
   statusCounts: { approved: number; inReview: number; blocked: number };
   trends: { date: string; count: number; reviewTime: number }[];
-  developerPatterns: { name: string; prs: number; avgComments: number }[];
+  developerPatterns: { name: string; prs: number; avgComments: number | null }[];
 }
 
 export interface PlanningRecommendation {
@@ -0,0 +1,196 @@
+"""Client-side admission control for Azure OpenAI calls.
+
+Two token buckets (tokens per minute and requests per minute) mirror the deployment's
+quota. Callers `acquire` with an estimated token count and a priority. Waiters are
+admitted strictly by priority, then FIFO, so interactive chat is never stuck behind
+background work. After the call, `settle` corrects the token bucket with the actual
+usage. A 429 pauses all admissions for the server's retry-after and halves the
+effective rate, which then recovers gradually on successful calls.
+"""
+import asyncio
+import heapq
+import itertools
+import os
+import time
+from typing import Callable, Optional
+
+INTERACTIVE = 0
+BACKGROUND = 10
+
+
+def estimate_tokens(messages, tools=None, completion_allowance: int = 800) -> int:
+    """Rough prompt size (~4 characters per token) plus an allowance for the completion."""
+    chars = 0
+    for message in messages:
+        content = getattr(message, "content", None)
+        if isinstance(content, list):
+            chars += sum(len(getattr(item, "text", "") or "") for item in content)
+        elif content:
+            chars += len(str(content))
+        for call in getattr(message, "tool_calls", None) or []:
+            chars += len(str(call))
+    if tools:
+        chars += sum(len(str(tool)) for tool in tools)
+    return chars // 4 + completion_allowance
+
+
+def retry_after_seconds(exc: Exception, default: float = 10.0) -> Optional[float]:
+    """Retry delay from a 429 error's headers, or None if `exc` is not a rate-limit error."""
+    if getattr(exc, "status_code", None) != 429:
+        return None
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    for name, scale in (("retry-after-ms", 0.001), ("x-ms-retry-after-ms", 0.001), ("retry-after", 1.0)):
+        value = headers.get(name)
+        if value is None:
+            continue
+        try:
+            return float(value) * scale
+        except ValueError:
+            continue
+    return default
+
+
+class _Bucket:
+    def __init__(self, per_minute: Optional[float], burst_seconds: float, clock: Callable[[], float]):
+        self.per_minute = per_minute
+        # Azure enforces quotas over short windows, so burst capacity is a fraction of the minute
+        self.capacity = per_minute * burst_seconds / 60.0 if per_minute is not None else None
+        self.level = self.capacity or 0.0
+        self.clock = clock
+        self.stamp = clock()
+
+    def refill(self, rate_factor: float):
+        now = self.clock()
+        if self.per_minute is not None:
+            self.level = min(self.capacity, self.level + (now - self.stamp) * self.per_minute / 60.0 * rate_factor)
+        self.stamp = now
+
+    def wait_for(self, amount: float, rate_factor: float) -> float:
+        """Seconds until `amount` is available (0 if now). Requests larger than capacity wait for a full bucket."""
+        if self.per_minute is None:
+            return 0.0
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) * 60.0 / (self.per_minute * rate_factor)
+
+    def take(self, amount: float):
+        """Consume `amount` (a negative amount refunds, up to capacity)."""
+        if self.per_minute is not None:
+            self.level = min(self.capacity, self.level - min(amount, self.capacity))
+
+
+class Ticket:
+    __slots__ = ("estimated", "priority", "waited")
+
+    def __init__(self, estimated: int, priority: int, waited: float):
+        self.estimated = estimated
+        self.priority = priority
+        self.waited = waited
+
+
+class AdmissionController:
+    """Priority admission in front of model calls, sized to TPM/RPM limits (None = unlimited).
+
+    Args:
+        tokens_per_minute: deployment token quota
+        requests_per_minute: deployment request quota
+        burst_seconds: how many seconds of quota may be spent at once
+        clock: monotonic time source (injectable for simulations)
+    """
+
+    def __init__(self, tokens_per_minute: Optional[float] = None, requests_per_minute: Optional[float] = None,
+                 burst_seconds: float = 10.0, clock: Callable[[], float] = time.monotonic):
+        self.clock = clock
+        self.tokens = _Bucket(tokens_per_minute, burst_seconds, clock)
+        self.requests = _Bucket(requests_per_minute, burst_seconds, clock)
+        self.rate_factor = 1.0
+        self.paused_until = 0.0
+        self._waiters: list = []
+        self._seq = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self.stats = {"admitted": 0, "rateLimited": 0, "waitSeconds": 0.0, "estimatedTokens": 0, "actualTokens": 0}
+
+    @classmethod
+    def from_env(cls) -> "AdmissionController":
+        """Limits from AZURE_AI_TPM / AZURE_AI_RPM; unset means unlimited (429 backoff still applies)."""
+        def read(name):
+            raw = os.environ.get(name)
+            try:
+                return float(raw) if raw else None
+            except ValueError:
+                return None
+        return cls(read("AZURE_AI_TPM"), read("AZURE_AI_RPM"))
+
+    async def acquire(self, estimated_tokens: int, priority: int = INTERACTIVE) -> Ticket:
+        """Wait until the call fits in both buckets and no higher-priority caller is waiting."""
+        started = self.clock()
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), estimated_tokens, future))
+        self._pump()
+        try:
+            await future
+        except asyncio.CancelledError:
+            # A cancelled waiter is left in the heap and skipped by _pump
+            self._pump()
+            raise
+        waited = self.clock() - started
+        self.stats["admitted"] += 1
+        self.stats["waitSeconds"] = round(self.stats["waitSeconds"] + waited, 3)
+        self.stats["estimatedTokens"] += estimated_tokens
+        return Ticket(estimated_tokens, priority, waited)
+
+    def settle(self, ticket: Ticket, actual_tokens: Optional[int]):
+        """Correct the token bucket once the real usage is known; a success also restores rate."""
+        if actual_tokens is not None:
+            self.tokens.take(actual_tokens - ticket.estimated)
+            self.stats["actualTokens"] += actual_tokens
+        self.rate_factor = min(1.0, self.rate_factor + 0.05)
+        self._pump()
+
+    def on_rate_limited(self, retry_after: float, ticket: Optional[Ticket] = None):
+        """Server said 429: stop admitting for `retry_after` and halve the effective rate.
+
+        The rejected call's estimated tokens are refunded when its `ticket` is given.
+        """
+        self.stats["rateLimited"] += 1
+        if ticket is not None:
+            self.tokens.take(-ticket.estimated)
+        self.paused_until = max(self.paused_until, self.clock() + retry_after)
+        self.rate_factor = max(0.1, self.rate_factor / 2)
+        self._pump()
+
+    def pending(self) -> int:
+        return sum(1 for *_, future in self._waiters if not future.done())
+
+    def summary(self) -> dict:
+        return {
+            **self.stats,
+            "pending": self.pending(),
+            "rateFactor": round(self.rate_factor, 2),
+            "pausedFor": round(max(0.0, self.paused_until - self.clock()), 2),
+        }
+
+    def _pump(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        while self._waiters:
+            _, _, estimated, future = self._waiters[0]
+            if future.done():
+                heapq.heappop(self._waiters)
+                continue
+            self.tokens.refill(self.rate_factor)
+            self.requests.refill(self.rate_factor)
+            delay = max(
+                self.paused_until - self.clock(),
+                self.tokens.wait_for(estimated, self.rate_factor),
+                self.requests.wait_for(1, self.rate_factor),
+            )
+            if delay > 0:
+                self._timer = asyncio.get_running_loop().call_later(delay, self._pump)
+                return
+            heapq.heappop(self._waiters)
+            self.tokens.take(estimated)
+            self.requests.take(1)
+            future.set_result(None)
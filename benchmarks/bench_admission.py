@@ -0,0 +1,150 @@
+"""Simulate bursty model traffic against a local fake endpoint that enforces TPM/RPM.
+
+Every call goes through `MCPClient._complete`, the path chatWithTools uses. Each tier's
+client is a stand-in with the ChatCompletionsClient `complete` signature. It raises
+`HttpResponseError` (429 with retry-after headers) when the window's quota is spent.
+Three set-ups are compared:
+
+- "SDK retries 429": the stand-in first sleeps through up to 10 429s in the worker
+  thread, as azure-core's default RetryPolicy does, so `_complete` rarely sees one
+- "controller owns 429": 429s reach `_complete` at once (ModelRetryPolicy), which pauses
+  admissions and halves the rate; no client-side TPM/RPM limits
+- "controller + TPM/RPM": the same, with the token/request buckets sized to the quota
+
+Interactive calls are mixed with a background burst to show priority ordering.
+
+Run:
+> python benchmarks/bench_admission.py
+"""
+import asyncio
+import collections
+import contextlib
+import io
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from azure.ai.inference.models import UserMessage  # noqa: E402
+from azure.core.exceptions import HttpResponseError  # noqa: E402
+
+from admission import BACKGROUND, INTERACTIVE, AdmissionController, estimate_tokens  # noqa: E402
+from AIToolkitDevops import MCPClient  # noqa: E402
+from model_tiers import LARGE, ModelTier  # noqa: E402
+
+TPM = 1_200_000
+RPM = 1_200
+WINDOW = 1.0  # the fake endpoint enforces quota over 1s windows
+SDK_RETRIES = 10  # azure-core RetryPolicy default retry_total
+
+
+def rate_limited(retry_after: float) -> HttpResponseError:
+    response = SimpleNamespace(status_code=429, reason="Too Many Requests",
+                               headers={"retry-after-ms": str(int(retry_after * 1000))})
+    return HttpResponseError(message="429 Too Many Requests", response=response)
+
+
+class FakeEndpoint:
+    """Sliding-window TPM/RPM enforcement with retry-after headers, like the Azure deployment.
+
+    Called from `asyncio.to_thread` workers, hence the lock and blocking sleeps.
+    """
+
+    def __init__(self, sdk_retries: int = 0, seed: int = 3):
+        self.sdk_retries = sdk_retries
+        self.calls = collections.deque()  # (timestamp, tokens)
+        self.lock = threading.Lock()
+        self.rng = random.Random(seed)
+        self.attempts = 0
+        self.rejected = 0
+
+    def _try(self, tokens: int):
+        with self.lock:
+            self.attempts += 1
+            now = time.monotonic()
+            while self.calls and self.calls[0][0] <= now - WINDOW:
+                self.calls.popleft()
+            used = sum(t for _, t in self.calls)
+            if used + tokens > TPM * WINDOW / 60 or len(self.calls) + 1 > RPM * WINDOW / 60:
+                self.rejected += 1
+                oldest = self.calls[0][0] if self.calls else now
+                raise rate_limited(oldest + WINDOW - now + 0.05)
+            self.calls.append((now, tokens))
+            completion = self.rng.randint(60, 140)
+        time.sleep(0.05)  # model latency
+        return completion
+
+    def complete(self, messages, model, tools=None):
+        # Azure charges the prompt plus the completion allowance against TPM up front
+        charged = estimate_tokens(messages, tools)
+        for attempt in range(self.sdk_retries + 1):
+            try:
+                completion = self._try(charged)
+                break
+            except HttpResponseError as e:
+                if attempt == self.sdk_retries:
+                    raise
+                time.sleep(float(e.response.headers["retry-after-ms"]) / 1000)
+        message = SimpleNamespace(content="ok", tool_calls=None)
+        usage = SimpleNamespace(prompt_tokens=charged - 800, completion_tokens=completion)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=usage)
+
+
+async def run(sdk_retries: int, limits: tuple, n_interactive: int = 40, n_background: int = 200) -> list[str]:
+    endpoint = FakeEndpoint(sdk_retries)
+    client = MCPClient(tiers={LARGE: ModelTier(LARGE, "fake", endpoint)})
+    client.admission = AdmissionController(*limits, burst_seconds=WINDOW)
+    latencies = {INTERACTIVE: [], BACKGROUND: []}
+    failures = 0
+
+    async def call(priority: int, delay: float, i: int):
+        nonlocal failures
+        await asyncio.sleep(delay)
+        messages = [UserMessage(content=f"question {i} " + "x" * 400)]
+        started = time.monotonic()
+        try:
+            await client._complete(client.tiers[LARGE], messages, [], priority)
+        except HttpResponseError:
+            failures += 1
+            return
+        latencies[priority].append(time.monotonic() - started)
+
+    # Background burst at t=0, interactive questions trickle in during it
+    jobs = [call(BACKGROUND, 0, i) for i in range(n_background)]
+    jobs += [call(INTERACTIVE, 0.1 + i * 0.05, i) for i in range(n_interactive)]
+    started = time.monotonic()
+    # _complete prints each 429 it handles; keep the report readable
+    with contextlib.redirect_stdout(io.StringIO()):
+        await asyncio.gather(*jobs)
+    total = time.monotonic() - started
+
+    lines = [
+        f"  total time              {total:.2f} s",
+        f"  endpoint attempts       {endpoint.attempts} for {n_interactive + n_background} calls ({endpoint.rejected} x 429)",
+        f"  429s seen by admission  {client.admission.stats['rateLimited']}",
+        f"  failed calls            {failures}",
+    ]
+    for priority, name in ((INTERACTIVE, "interactive"), (BACKGROUND, "background")):
+        values = sorted(latencies[priority])
+        if values:
+            p95 = values[max(int(len(values) * 0.95) - 1, 0)]
+            lines.append(f"  {name:<12} latency    p50 {statistics.median(values):5.2f} s   p95 {p95:5.2f} s")
+    return lines
+
+
+async def main():
+    for label, sdk_retries, limits in (
+        ("SDK retries 429 (default RetryPolicy)", SDK_RETRIES, (None, None)),
+        ("controller owns 429 (ModelRetryPolicy)", 0, (None, None)),
+        ("controller owns 429 + TPM/RPM buckets", 0, (TPM, RPM)),
+    ):
+        print(label)
+        print("\n".join(await run(sdk_retries, limits)) + "\n")
+
+if __name__ == "__main__":
+    asyncio.run(main())
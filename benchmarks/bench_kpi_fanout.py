@@ -0,0 +1,104 @@
+"""Fan-out cost of KPIBroadcaster with many simulated SSE subscribers.
+
+The KPI computation (which stands in for the MCP calls) must run once per refresh
+regardless of subscriber count; this reports compute calls, broadcast latency
+and memory per subscriber. A second case fires concurrent GET /api/kpis-style
+`get_kpis` calls at a cold broadcaster, which must share a single computation.
+
+Run:
+> python benchmarks/bench_kpi_fanout.py [subscribers] [refreshes]
+"""
+import asyncio
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from kpi_stream import KPIBroadcaster  # noqa: E402
+
+
+async def run(n_subscribers: int, refreshes: int):
+    rng = random.Random(7)
+    compute_calls = 0
+
+    async def compute():
+        nonlocal compute_calls
+        compute_calls += 1
+        await asyncio.sleep(0.01)  # simulated MCP round-trip
+        # Two of five KPIs change per refresh
+        return [
+            {"id": f"kpi-{i}", "label": f"KPI {i}", "value": rng.randint(0, 100) if i < 2 else 42}
+            for i in range(5)
+        ]
+
+    broadcaster = KPIBroadcaster(compute, interval=3600)
+    received = 0
+
+    async def consume(sub):
+        nonlocal received
+        while True:
+            await sub.queue.get()
+            received += 1
+
+    tracemalloc.start()
+    await broadcaster.refresh()
+    subs = [broadcaster.subscribe() for _ in range(n_subscribers)]
+    consumers = [asyncio.create_task(consume(sub)) for sub in subs]
+    await asyncio.sleep(0)
+    subscribed_mem, _ = tracemalloc.get_traced_memory()
+
+    timings = []
+    for _ in range(refreshes):
+        started = time.perf_counter()
+        await broadcaster.refresh()
+        timings.append(time.perf_counter() - started)
+        await asyncio.sleep(0)  # let consumers drain
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    for task in consumers:
+        task.cancel()
+    await broadcaster.close()
+
+    publish_ms = [(t - 0.01) * 1000 for t in timings]
+    print(f"subscribers          {n_subscribers}")
+    print(f"refreshes            {refreshes}")
+    print(f"compute calls        {compute_calls}  (1 initial + {refreshes})")
+    print(f"messages delivered   {received}")
+    print(f"diff+publish / tick  avg {sum(publish_ms) / len(publish_ms):.2f} ms, max {max(publish_ms):.2f} ms")
+    print(f"memory / subscriber  {subscribed_mem / n_subscribers:.0f} B (peak total {peak / 1024:.0f} KiB)")
+    print(f"resyncs              {broadcaster.stats['resyncs']}")
+
+
+async def run_concurrent_cold(callers: int, compute_seconds: float = 0.2):
+    compute_calls = 0
+
+    async def compute():
+        nonlocal compute_calls
+        compute_calls += 1
+        await asyncio.sleep(compute_seconds)
+        return [{"id": f"kpi-{i}", "label": f"KPI {i}", "value": i} for i in range(5)]
+
+    broadcaster = KPIBroadcaster(compute, interval=3600)
+
+    async def call():
+        started = time.perf_counter()
+        await broadcaster.get_kpis()
+        return time.perf_counter() - started
+
+    latencies = await asyncio.gather(*(call() for _ in range(callers)))
+    await broadcaster.close()
+    print(f"\nconcurrent cold get_kpis callers {callers}")
+    print(f"compute calls        {compute_calls}  (expected 1)")
+    print(f"caller latency       max {max(latencies) * 1000:.0f} ms  (one compute = {compute_seconds * 1000:.0f} ms)")
+    assert compute_calls == 1, "concurrent callers each recomputed the KPIs"
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    r = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    asyncio.run(run(n, r))
+    asyncio.run(run_concurrent_cold(20))
@@ -0,0 +1,136 @@
+"""Latency and cost of large-only vs. tiered (small first, escalate) chatWithTools.
+
+Both model tiers are in-process stand-ins with the ChatCompletionsClient `complete`
+signature. Each follows a scripted plan per prompt: rounds of tool calls, then an answer.
+The small stand-in replies ESCALATE on prompts marked as beyond it. Latency grows with
+prompt size, and the small model is modelled as several times faster and cheaper. The
+MCP session is a fake that returns a short JSON payload.
+
+Run:
+> python benchmarks/bench_model_tiers.py [conversations]
+"""
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from azure.ai.inference.models import SystemMessage, TextContentItem, ToolMessage, UserMessage  # noqa: E402
+from mcp.types import Tool  # noqa: E402
+
+from AIToolkitDevops import SYSTEM_PROMPT, MCPClient  # noqa: E402
+from model_tiers import ESCALATE, LARGE, SMALL, ModelTier  # noqa: E402
+
+# prompt -> (tool rounds, whether the small model declines it, traffic weight)
+SCENARIOS = {
+    "List active pull requests in VAIDMS": ([["repo_list_pull_requests_by_repo_or_project"]], False, 5),
+    "Show my work items": ([["wit_my_work_items"]], False, 4),
+    "Which repositories are in VAIDMS?": ([["repo_list_repos_by_project"]], False, 3),
+    "What state is work item 1234 in?": ([["wit_get_work_item"]], False, 3),
+    "Who has the most open reviews on repo1?": ([["repo_list_repos_by_project"], ["repo_list_pull_requests_by_repo_or_project"]], False, 2),
+    "Is the team over capacity this sprint?": ([["work_list_team_iterations"], ["wit_get_work_items_for_iteration"]], True, 2),
+    "Compare velocity of the last three sprints and explain the trend": (
+        [["work_list_iterations"], ["wit_get_work_items_for_iteration"] * 3], False, 1),
+}
+TOOLS = sorted({tool for rounds, _, _ in SCENARIOS.values() for step in rounds for tool in step})
+
+
+class StandInModel:
+    """Scripted completion endpoint: latency = base + per_1k * prompt tokens / 1000."""
+
+    def __init__(self, name: str, base: float, per_1k: float, declines: bool):
+        self.name = name
+        self.base = base
+        self.per_1k = per_1k
+        self.declines = declines
+
+    def complete(self, messages, model, tools=None):
+        prompt = next(m.content[0].text for m in messages if isinstance(m, UserMessage))
+        rounds, hard, _ = SCENARIOS[prompt]
+        prompt_tokens = sum(len(str(getattr(m, "content", "") or "")) + len(str(getattr(m, "tool_calls", "") or "")) for m in messages) // 4
+        prompt_tokens += len(json.dumps(tools or [])) // 4
+        time.sleep(self.base + self.per_1k * prompt_tokens / 1000)
+
+        done = sum(1 for m in messages if isinstance(m, ToolMessage))
+        step = 0
+        while step < len(rounds) and done >= len(rounds[step]):
+            done -= len(rounds[step])
+            step += 1
+        if self.declines and hard:
+            message = SimpleNamespace(content=ESCALATE, tool_calls=None)
+        elif step < len(rounds):
+            calls = [SimpleNamespace(id=f"call_{step}_{i}", function=SimpleNamespace(name=tool, arguments=json.dumps({"project": "VAIDMS"})))
+                     for i, tool in enumerate(rounds[step])]
+            message = SimpleNamespace(content=None, tool_calls=calls)
+        else:
+            message = SimpleNamespace(content=f"{self.name} answer for: {prompt}", tool_calls=None)
+        completion_tokens = 30 if message.tool_calls else 120
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)],
+                               usage=SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens))
+
+
+class FakeSession:
+    async def call_tool(self, name, args):
+        await asyncio.sleep(0.01)
+        payload = json.dumps([{"id": i, "name": f"{name} row {i}", "status": "active"} for i in range(20)])
+        return SimpleNamespace(content=[SimpleNamespace(text=payload)], isError=False)
+
+
+def make_client(tiered: bool) -> MCPClient:
+    tiers = {LARGE: ModelTier(LARGE, "large-standin", StandInModel("large", 0.25, 0.08, declines=False), 0.002, 0.008)}
+    if tiered:
+        tiers[SMALL] = ModelTier(SMALL, "small-standin", StandInModel("small", 0.05, 0.015, declines=True), 0.0004, 0.0016)
+    client = MCPClient(tiers=tiers)
+    client._servers["azure devops"] = {
+        "session": FakeSession(),
+        "tools": [Tool(name=t, description=f"{t} tool", inputSchema={"type": "object", "properties": {"project": {"type": "string"}}})
+                  for t in TOOLS],
+    }
+    client._tool_to_server_map = {t: "azure devops" for t in TOOLS}
+    return client
+
+
+async def run(tiered: bool, prompts: list[str]) -> tuple[MCPClient, list[float]]:
+    client = make_client(tiered)
+    latencies = []
+    for prompt in prompts:
+        messages = [SystemMessage(content=SYSTEM_PROMPT), UserMessage(content=[TextContentItem(text=prompt)])]
+        started = time.perf_counter()
+        await client.chatWithTools(messages)
+        latencies.append(time.perf_counter() - started)
+    return client, latencies
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    rng = random.Random(7)
+    names = list(SCENARIOS)
+    prompts = rng.choices(names, weights=[SCENARIOS[p][2] for p in names], k=n)
+
+    # chatWithTools prints every round-trip; keep the benchmark output readable
+    real_stdout, sys.stdout = sys.stdout, open(os.devnull, "w")
+    try:
+        results = {label: asyncio.run(run(tiered, prompts)) for label, tiered in (("large only", False), ("tiered", True))}
+    finally:
+        sys.stdout.close()
+        sys.stdout = real_stdout
+
+    print(f"{n} conversations\n")
+    for label, (client, latencies) in results.items():
+        tiers = client.get_tier_stats()
+        escalations = sum(row["escalations"] for row in client.get_usage_stats())
+        cost = sum(row["cost"] for row in tiers.values())
+        print(f"{label:<11} p50 {statistics.median(latencies):5.2f}s   p95 {sorted(latencies)[int(0.95 * (n - 1))]:5.2f}s   "
+              f"cost ${cost:.4f}   escalated {escalations}/{n}")
+        for name, row in tiers.items():
+            print(f"  {name:<6} calls {row['calls']:4d}   avg latency {row['avgLatency'] or 0:5.2f}s   "
+                  f"tokens {row['promptTokens'] + row['completionTokens']:7d}   cost ${row['cost']:.4f}")
+
+
+if __name__ == "__main__":
+    main()
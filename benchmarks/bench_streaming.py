@@ -0,0 +1,98 @@
+"""Peak memory of materialized vs. batched NDJSON work-item listings.
+
+"materialized" is the previous shape: one batch call for every ID, the whole response
+parsed, then the full JSON array serialized. "ndjson" fetches 200 IDs at a time and
+writes each row as it is converted, as `/api/sprints/{id}/work-items?format=ndjson` does.
+Each mode runs in its own subprocess so peak RSS is not shared.
+
+Run:
+> python benchmarks/bench_streaming.py [n_items]
+"""
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi_app import WORK_ITEM_BATCH_SIZE, work_item_row  # noqa: E402
+from workitem_frame import WorkItemFrame  # noqa: E402
+
+
+STATES = ["New", "Active", "Resolved", "Closed", "Done"]
+BASE = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+def make_item(i: int) -> dict:
+    rng = random.Random(i)
+    created = BASE + timedelta(hours=rng.randint(0, 24 * 60))
+    state = rng.choice(STATES)
+    fields = {
+        "System.Id": 1000 + i,
+        "System.Title": f"Work item {i} " + "x" * rng.randint(20, 80),
+        "System.WorkItemType": "Product Backlog Item",
+        "System.State": state,
+        "System.AssignedTo": {"displayName": f"Developer {i % 25}", "uniqueName": "dev@example.com"},
+        "System.CreatedDate": created.isoformat().replace("+00:00", "Z"),
+        "System.ChangedDate": (created + timedelta(hours=5)).isoformat().replace("+00:00", "Z"),
+        "System.IterationPath": "VAIDMS\\Sprint 12",
+        "System.Description": "<div>" + "lorem ipsum " * rng.randint(20, 60) + "</div>",
+        "Microsoft.VSTS.Scheduling.StoryPoints": rng.choice([1, 2, 3, 5, 8]),
+    }
+    if state in ("Resolved", "Closed", "Done"):
+        fields["Microsoft.VSTS.Common.ClosedDate"] = (created + timedelta(hours=rng.randint(1, 240))).isoformat().replace("+00:00", "Z")
+    return {"id": 1000 + i, "rev": 3, "fields": fields, "url": f"https://dev.azure.com/x/_apis/wit/workItems/{1000 + i}"}
+
+
+def fetch(start: int, count: int) -> list:
+    """Stand-in for one wit_get_work_items_batch_by_ids call: serialized response, then parsed."""
+    payload = json.dumps({"value": [make_item(i) for i in range(start, start + count)]})
+    return json.loads(payload)["value"]
+
+
+def run_materialized(n: int, sink):
+    items = fetch(0, n)
+    sink.write(json.dumps([work_item_row(wi) for wi in items]))
+    return WorkItemFrame.from_items(items)
+
+
+def run_ndjson(n: int, sink):
+    frame = WorkItemFrame.from_items([])
+    for start in range(0, n, WORK_ITEM_BATCH_SIZE):
+        batch = fetch(start, min(WORK_ITEM_BATCH_SIZE, n - start))
+        for wi in batch:
+            sink.write(json.dumps(work_item_row(wi)) + "\n")
+        frame.extend(batch)
+    return frame
+
+
+def child(mode: str, n: int):
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    started = time.perf_counter()
+    with open(os.devnull, "w") as sink:
+        frame = (run_materialized if mode == "materialized" else run_ndjson)(n, sink)
+    elapsed = time.perf_counter() - started
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux
+    print(json.dumps({"rows": len(frame), "seconds": elapsed, "peakKiB": peak, "growthKiB": peak - baseline}))
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    print(f"{n} work items, batches of {WORK_ITEM_BATCH_SIZE}\n")
+    for mode in ("materialized", "ndjson"):
+        out = subprocess.run([sys.executable, __file__, "--child", mode, str(n)], capture_output=True, text=True, check=True)
+        stats = json.loads(out.stdout.strip().splitlines()[-1])
+        print(f"{mode:<14} {stats['seconds'] * 1000:9.1f} ms   peak RSS {stats['peakKiB'] / 1024:7.1f} MiB   "
+              f"growth {stats['growthKiB'] / 1024:7.1f} MiB   rows {stats['rows']}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--child":
+        child(sys.argv[2], int(sys.argv[3]))
+    else:
+        main()
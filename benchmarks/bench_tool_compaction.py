@@ -0,0 +1,156 @@
+"""Token reduction of compact_tool_result per tool.
+
+By default runs on synthetic payloads shaped like Azure DevOps MCP responses.
+Pass a directory of recorded outputs (one ``<tool_name>.json`` file per tool, holding
+the tool's text content) to measure real traffic instead.
+
+Run:
+> python benchmarks/bench_tool_compaction.py [--recorded DIR]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mcp.types import TextContent  # noqa: E402
+
+from tool_compaction import compact_tool_result  # noqa: E402
+
+try:
+    import tiktoken
+    _ENCODING = tiktoken.get_encoding("o200k_base")
+except Exception:
+    # tiktoken is optional; fall back to the usual ~4 characters per token
+    _ENCODING = None
+
+
+def count_tokens(text: str) -> int:
+    return len(_ENCODING.encode(text)) if _ENCODING else len(text) // 4
+
+
+def _identity(i):
+    return {
+        "displayName": f"Developer {i}",
+        "uniqueName": f"dev{i}@contoso.com",
+        "id": f"0000-{i:04d}",
+        "url": f"https://spsprodcus1.vssps.visualstudio.com/_apis/Identities/0000-{i:04d}",
+        "imageUrl": f"https://dev.azure.com/contoso/_apis/GraphProfile/MemberAvatars/aad.{i:04d}",
+        "descriptor": f"aad.ZmFrZS1kZXNjcmlwdG9yLXt7aX19{i:04d}",
+        "_links": {"avatar": {"href": f"https://dev.azure.com/contoso/_apis/GraphProfile/MemberAvatars/aad.{i:04d}"}},
+    }
+
+
+def synthetic_outputs() -> dict:
+    work_items = [
+        {
+            "id": 4000 + i,
+            "rev": 7,
+            "fields": {
+                "System.AreaPath": "VAIDMS",
+                "System.TeamProject": "VAIDMS",
+                "System.IterationPath": "VAIDMS\\Dev1",
+                "System.WorkItemType": "Product Backlog Item",
+                "System.State": ["New", "Active", "Done"][i % 3],
+                "System.Reason": "Moved to state",
+                "System.AssignedTo": _identity(i % 6),
+                "System.CreatedDate": "2025-01-02T10:00:00.123Z",
+                "System.CreatedBy": _identity(1),
+                "System.ChangedDate": "2025-01-05T10:00:00.456Z",
+                "System.ChangedBy": _identity(2),
+                "System.CommentCount": 2,
+                "System.Title": f"Implement feature slice {i}",
+                "System.BoardColumn": "Committed",
+                "System.BoardColumnDone": False,
+                "Microsoft.VSTS.Common.StateChangeDate": "2025-01-04T10:00:00Z",
+                "Microsoft.VSTS.Common.Priority": 2,
+                "Microsoft.VSTS.Scheduling.Effort": 3,
+                "System.Description": "<div>" + "Acceptance criteria and notes. " * 8 + "</div>",
+            },
+            "url": f"https://dev.azure.com/contoso/_apis/wit/workItems/{4000 + i}",
+            "_links": {"self": {"href": "https://dev.azure.com/contoso/x"}, "workItemUpdates": {"href": "https://dev.azure.com/contoso/y"}},
+        }
+        for i in range(60)
+    ]
+    pull_requests = [
+        {
+            "repository": {"id": "9f1c", "name": "devops-portal", "url": "https://dev.azure.com/contoso/_apis/git/repositories/9f1c",
+                           "project": {"id": "p1", "name": "VAIDMS", "state": "wellFormed", "visibility": "private"}},
+            "pullRequestId": 700 + i,
+            "codeReviewId": 700 + i,
+            "status": "active" if i % 2 else "completed",
+            "createdBy": _identity(i % 5),
+            "creationDate": "2025-01-03T09:00:00Z",
+            "closedDate": None if i % 2 else "2025-01-04T15:30:00Z",
+            "title": f"Fix pipeline step {i}",
+            "description": "This PR updates the build pipeline. " * 5,
+            "sourceRefName": f"refs/heads/feature/{i}",
+            "targetRefName": "refs/heads/main",
+            "mergeStatus": "succeeded",
+            "isDraft": False,
+            "mergeId": "a" * 36,
+            "lastMergeSourceCommit": {"commitId": "b" * 40, "url": "https://dev.azure.com/contoso/c"},
+            "lastMergeTargetCommit": {"commitId": "c" * 40, "url": "https://dev.azure.com/contoso/d"},
+            "reviewers": [{**_identity((i + 1) % 5), "vote": 10, "reviewerUrl": "https://dev.azure.com/contoso/r", "hasDeclined": False}],
+            "url": f"https://dev.azure.com/contoso/_apis/git/repositories/9f1c/pullRequests/{700 + i}",
+            "supportsIterations": True,
+        }
+        for i in range(40)
+    ]
+    iterations = [{
+        "id": 1, "identifier": "root", "name": "VAIDMS", "structureType": "iteration", "hasChildren": True,
+        "path": "\\VAIDMS\\Iteration", "url": "https://dev.azure.com/contoso/_apis/wit/classificationNodes/Iterations",
+        "children": [
+            {"id": 10 + i, "identifier": f"guid-{i}", "name": f"Sprint {i}", "structureType": "iteration", "hasChildren": False,
+             "path": f"\\VAIDMS\\Iteration\\Sprint {i}", "url": f"https://dev.azure.com/contoso/_apis/wit/classificationNodes/Iterations/Sprint%20{i}",
+             "attributes": {"startDate": "2025-01-01T00:00:00Z", "finishDate": "2025-01-14T00:00:00Z"}}
+            for i in range(30)
+        ],
+    }]
+    teams = [{"id": f"team-{i}", "name": f"Team {i}", "url": "https://dev.azure.com/contoso/_apis/projects/p1/teams/x",
+              "description": "Delivery team", "identityUrl": "https://spsprodcus1.vssps.visualstudio.com/_apis/Identities/x",
+              "projectName": "VAIDMS", "projectId": "p1"} for i in range(8)]
+    return {
+        "wit_get_work_items_batch_by_ids": json.dumps(work_items),
+        "repo_list_pull_requests_by_repo_or_project": json.dumps(pull_requests),
+        "work_list_iterations": json.dumps(iterations),
+        "core_list_project_teams": json.dumps(teams),
+    }
+
+
+def recorded_outputs(directory: str) -> dict:
+    outputs = {}
+    for name in sorted(os.listdir(directory)):
+        if name.endswith(".json"):
+            with open(os.path.join(directory, name), "r", encoding="utf-8") as f:
+                outputs[name[:-5]] = f.read()
+    return outputs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--recorded", help="Directory of <tool_name>.json recorded tool outputs.")
+    parser.add_argument("--max-chars", type=int, default=12000)
+    args = parser.parse_args()
+
+    outputs = recorded_outputs(args.recorded) if args.recorded else synthetic_outputs()
+    print(f"token counter: {'tiktoken o200k_base' if _ENCODING else 'chars/4 estimate'}\n")
+    print(f"{'tool':<44} {'before':>8} {'after':>8} {'saved':>7} {'ms':>6}")
+    total_before = total_after = 0
+    for tool, text in outputs.items():
+        # What chatWithTools used to send: the repr of the TextContent list
+        before = count_tokens(str([TextContent(type="text", text=text)]))
+        started = time.perf_counter()
+        compact = compact_tool_result(tool, [TextContent(type="text", text=text)], args.max_chars)
+        elapsed = (time.perf_counter() - started) * 1000
+        after = count_tokens(compact)
+        total_before += before
+        total_after += after
+        print(f"{tool:<44} {before:>8} {after:>8} {1 - after / before:>6.0%} {elapsed:>6.1f}")
+    print(f"{'total':<44} {total_before:>8} {total_after:>8} {1 - total_after / total_before:>6.0%}")
+
+
+if __name__ == "__main__":
+    main()
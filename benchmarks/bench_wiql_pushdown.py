@@ -0,0 +1,215 @@
+"""Full work-item batch fetches vs. WIQL filtering with field-projected batches.
+
+Runs the API's own fetch path (`fetch_completed_frame`, `fetch_work_item_frame`) against
+a fake MCP server. The server holds a project with two teams (area paths) and a sprint
+with a child iteration. It answers:
+
+- the team iteration query: the team's area, exact iteration
+- WIQL, by evaluating the clauses `build_wiql` emits (=, UNDER, IN) against the items
+- batch fetches: full documents (description, acceptance criteria, links, relations,
+  identity objects) unless `fields` are requested
+
+The script reports bytes transferred, upstream calls and time per variant. It checks
+that the aggregates match the full fetch, and shows how far a project-wide
+`IterationPath UNDER` query would have over-counted.
+
+Run:
+> python benchmarks/bench_wiql_pushdown.py [n_items]
+"""
+import asyncio
+import json
+import os
+import random
+import re
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi_app import fetch_completed_frame, fetch_iteration_work_item_ids, fetch_work_item_frame  # noqa: E402
+from workitem_frame import COMPLETED_STATES, WorkItemFrame  # noqa: E402
+from workitem_query import WIQL_TOOL, build_wiql, iteration_wiql_path  # noqa: E402
+
+PROJECT = "VAIDMS"
+TEAM_AREA = "VAIDMS\\Platform"
+# As reported by work_list_iterations
+SPRINT = {"identifier": "sprint-12-guid", "path": "\\VAIDMS\\Iteration\\Sprint 12"}
+AREAS = [(TEAM_AREA, 6), ("VAIDMS\\Mobile", 4)]
+ITERATIONS = [("VAIDMS\\Sprint 12", 7), ("VAIDMS\\Sprint 12\\Hardening", 2), ("VAIDMS\\Sprint 11", 1)]
+STATES = ["New", "Active", "Resolved", "Closed", "Done"]
+BASE = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+def identity(name: str) -> dict:
+    return {
+        "displayName": name,
+        "uniqueName": f"{name.lower().replace(' ', '.')}@example.com",
+        "id": "6f1c2a3e-0000-4000-8000-000000000000",
+        "imageUrl": "https://dev.azure.com/org/_apis/GraphProfile/MemberAvatars/aad.abc",
+        "descriptor": "aad.NjFjMmEzZS0wMDAwLTQwMDAtODAwMC0wMDAwMDAwMDAwMDA",
+        "_links": {"avatar": {"href": "https://dev.azure.com/org/_apis/GraphProfile/MemberAvatars/aad.abc"}},
+    }
+
+
+def timestamp(dt: datetime) -> str:
+    return dt.strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z"
+
+
+def make_item(i: int) -> dict:
+    """A full work-item document as returned without a `fields` filter."""
+    rng = random.Random(i)
+    created = BASE + timedelta(seconds=rng.uniform(0, 86400 * 60))
+    state = rng.choice(STATES)
+    person = f"Developer {i % 25}"
+    fields = {
+        "System.Id": 1000 + i,
+        "System.AreaPath": rng.choices(*zip(*AREAS))[0],
+        "System.TeamProject": PROJECT,
+        "System.IterationPath": rng.choices(*zip(*ITERATIONS))[0],
+        "System.WorkItemType": "Product Backlog Item",
+        "System.State": state,
+        "System.Reason": "Moved to state " + state,
+        "System.AssignedTo": identity(person),
+        "System.CreatedBy": identity("Product Owner"),
+        "System.ChangedBy": identity(person),
+        "System.CreatedDate": timestamp(created),
+        "System.ChangedDate": timestamp(created + timedelta(seconds=rng.uniform(60, 86400 * 5))),
+        "System.CommentCount": rng.randint(0, 12),
+        "System.Title": f"Work item {i} " + "x" * rng.randint(20, 80),
+        "System.Description": "<div>" + "As a user I want " * rng.randint(30, 120) + "</div>",
+        "Microsoft.VSTS.Common.AcceptanceCriteria": "<ul>" + "<li>criterion</li>" * rng.randint(3, 15) + "</ul>",
+        "Microsoft.VSTS.Common.Priority": rng.randint(1, 4),
+        "Microsoft.VSTS.Common.BacklogPriority": rng.random() * 1e6,
+        "Microsoft.VSTS.Scheduling.Effort": rng.choice([1, 2, 3, 5, 8, 13]),
+        "System.Tags": "backend; api",
+    }
+    if state in ("Resolved", "Closed", "Done"):
+        fields["Microsoft.VSTS.Common.ClosedDate"] = timestamp(created + timedelta(seconds=rng.uniform(600, 86400 * 10)))
+        fields["Microsoft.VSTS.Common.ClosedBy"] = identity(person)
+    return {
+        "id": 1000 + i,
+        "rev": rng.randint(2, 30),
+        "fields": fields,
+        "relations": [{"rel": "System.LinkTypes.Hierarchy-Reverse", "url": f"https://dev.azure.com/org/_apis/wit/workItems/{i // 10}",
+                       "attributes": {"isLocked": False, "name": "Parent"}}],
+        "_links": {name: {"href": f"https://dev.azure.com/org/_apis/wit/workItems/{1000 + i}/{name}"}
+                   for name in ("self", "workItemUpdates", "workItemRevisions", "workItemComments", "html", "workItemType", "fields")},
+        "url": f"https://dev.azure.com/org/_apis/wit/workItems/{1000 + i}",
+    }
+
+
+_CLAUSE = re.compile(r"\[(?P<field>[\w.]+)\] (?P<op>=|UNDER|IN) (?P<value>.+)")
+_LITERAL = re.compile(r"'((?:[^']|'')*)'")
+
+
+def wiql_matcher(wiql: str):
+    """Predicate over item fields for the WHERE clauses `build_wiql` produces (case-insensitive)."""
+    where = wiql.split(" WHERE ", 1)[1].split(" ORDER BY ", 1)[0]
+    tests = []
+    for clause in where.split(" AND "):
+        match = _CLAUSE.fullmatch(clause)
+        if match is None:
+            raise ValueError(f"Unsupported WIQL clause: {clause}")
+        values = [v.replace("''", "'").lower() for v in _LITERAL.findall(match["value"])]
+        tests.append((match["field"], match["op"], values))
+
+    def matches(fields: dict) -> bool:
+        for field, op, values in tests:
+            actual = str(fields.get(field, "")).lower()
+            if op == "=" and actual != values[0]:
+                return False
+            if op == "UNDER" and not (actual == values[0] or actual.startswith(values[0] + "\\")):
+                return False
+            if op == "IN" and actual not in values:
+                return False
+        return True
+    return matches
+
+
+class FakeDevOps:
+    """MCP session stand-in; counts calls and response bytes."""
+
+    def __init__(self, items: list[dict]):
+        self.items = {wi["id"]: wi for wi in items}
+        self.calls = 0
+        self.bytes = 0
+
+    def respond(self, payload) -> SimpleNamespace:
+        text = json.dumps(payload)
+        self.calls += 1
+        self.bytes += len(text)
+        return SimpleNamespace(content=[SimpleNamespace(text=text)], isError=False)
+
+    async def call_tool(self, name: str, args: dict):
+        await asyncio.sleep(0)
+        if name == "wit_get_work_items_for_iteration":
+            ids = [wi_id for wi_id, wi in self.items.items()
+                   if wi["fields"]["System.AreaPath"] == TEAM_AREA
+                   and wi["fields"]["System.IterationPath"] == iteration_wiql_path(SPRINT["path"])]
+            return self.respond({"workItemRelations": [{"rel": None, "source": None, "target": {"id": wi_id}} for wi_id in ids]})
+        if name == WIQL_TOOL:
+            matches = wiql_matcher(args["wiql"])
+            return self.respond({"workItems": [{"id": wi_id} for wi_id, wi in self.items.items() if matches(wi["fields"])]})
+        if name == "wit_get_work_items_batch_by_ids":
+            docs = [self.items[wi_id] for wi_id in args["ids"]]
+            if args.get("fields"):
+                docs = [{"id": wi["id"], "rev": wi["rev"], "url": wi["url"],
+                         "fields": {f: wi["fields"][f] for f in args["fields"] if f in wi["fields"]}} for wi in docs]
+            return self.respond({"value": docs})
+        raise ValueError(f"Unexpected tool {name}")
+
+
+def make_client(session: FakeDevOps, wiql: bool) -> SimpleNamespace:
+    tools = ["wit_get_work_items_for_iteration", "wit_get_work_items_batch_by_ids"] + ([WIQL_TOOL] if wiql else [])
+    return SimpleNamespace(_servers={"azure devops": {"session": session, "tools": []}},
+                           _tool_to_server_map={tool: "azure devops" for tool in tools})
+
+
+def aggregates(frame: WorkItemFrame) -> tuple:
+    completed = frame.completed()
+    return (len(completed), round(completed.effort_total(), 6), completed.load_by_assignee(),
+            round(sum(completed.cycle_times_hours()), 3))
+
+
+async def full_fetch(client):
+    session = client._servers["azure devops"]["session"]
+    ids = await fetch_iteration_work_item_ids(session, PROJECT, "team", SPRINT["identifier"])
+    return (await fetch_work_item_frame(session, PROJECT, ids, fields=None)).completed()
+
+
+async def measure(label: str, items: list[dict], run, wiql: bool) -> WorkItemFrame:
+    session = FakeDevOps(items)
+    started = time.perf_counter()
+    frame = await run(make_client(session, wiql))
+    elapsed = time.perf_counter() - started
+    print(f"{label:<36} transfer {session.bytes / 1024:9.1f} KiB   calls {session.calls:4d}   {elapsed * 1000:8.1f} ms")
+    return frame
+
+
+async def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    items = [make_item(i) for i in range(n)]
+    print(f"{n} work items in the project\n")
+
+    def completed_fetch(client):
+        return fetch_completed_frame(client, PROJECT, "team", SPRINT)
+
+    expected = aggregates(await measure("full batch (previous)", items, full_fetch, wiql=False))
+    projected = await measure("projected batch, local filter", items, completed_fetch, wiql=False)
+    pushed = await measure("WIQL completed + projected batch", items, completed_fetch, wiql=True)
+
+    assert aggregates(projected) == expected, "projected fetch disagrees with full fetch"
+    assert aggregates(pushed) == expected, "WIQL-filtered fetch disagrees with full fetch"
+
+    states = [s.title() for s in COMPLETED_STATES]
+    path = iteration_wiql_path(SPRINT["path"])
+    unscoped = wiql_matcher(build_wiql(PROJECT, path, states, include_child_iterations=True))
+    over = sum(1 for wi in items if unscoped(wi["fields"]))
+    print(f"\naggregates match the full fetch ({expected[0]} completed team items)")
+    print(f"a project-wide 'IterationPath UNDER' query would have counted {over}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,143 @@
+"""Compare WorkItemFrame against the dict-of-dicts aggregation it replaced.
+
+Endpoints build a frame per request and aggregate it once, so the CPU comparison is
+frame build + aggregate vs. aggregating the parsed dicts directly. The two are timed in
+alternating rounds, so machine noise affects both alike. Memory is measured in a separate
+tracemalloc pass, because tracing distorts timings.
+
+Run:
+> python benchmarks/bench_workitem_frame.py [n_items]
+"""
+import json
+import os
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from workitem_frame import WorkItemFrame  # noqa: E402
+
+STATES = ["New", "Active", "Resolved", "Closed", "Done"]
+PEOPLE = [f"Developer {i}" for i in range(25)]
+
+
+def azure_timestamp(dt: datetime) -> str:
+    """Azure DevOps style: millisecond precision, 'Z' suffix (e.g. 2025-01-03T10:15:42.183Z)."""
+    return dt.strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z"
+
+
+def make_payload(n: int) -> str:
+    """Serialized batch response shaped like wit_get_work_items_batch_by_ids output.
+
+    Timestamps are random to the millisecond, so (as in real data) nearly all are distinct.
+    """
+    rng = random.Random(42)
+    base = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    items = []
+    for i in range(n):
+        created = base + timedelta(seconds=rng.uniform(0, 86400 * 60))
+        state = rng.choice(STATES)
+        fields = {
+            "System.Id": 1000 + i,
+            "System.State": state,
+            "System.AssignedTo": {"displayName": rng.choice(PEOPLE), "uniqueName": "dev@example.com"},
+            "System.CreatedDate": azure_timestamp(created),
+            "System.ChangedDate": azure_timestamp(created + timedelta(seconds=rng.uniform(60, 86400 * 5))),
+            "Microsoft.VSTS.Scheduling.StoryPoints": rng.choice([1, 2, 3, 5, 8]),
+        }
+        if state in ("Resolved", "Closed", "Done"):
+            closed = created + timedelta(seconds=rng.uniform(600, 86400 * 10))
+            fields["Microsoft.VSTS.Common.ClosedDate"] = azure_timestamp(closed)
+        items.append({"id": 1000 + i, "rev": 3, "fields": fields, "url": f"https://dev.azure.com/x/_apis/wit/workItems/{1000 + i}"})
+    return json.dumps({"value": items})
+
+
+def dict_aggregate(items):
+    """The per-request dict approach previously inlined in sprint_insights/dashboard."""
+    def parse_dt(dt):
+        try:
+            return datetime.fromisoformat(dt.replace("Z", "+00:00"))
+        except Exception:
+            return None
+
+    def effort(wi):
+        for key in ("Microsoft.VSTS.Scheduling.Effort", "Microsoft.VSTS.Scheduling.StoryPoints"):
+            val = wi["fields"].get(key)
+            if isinstance(val, (int, float)):
+                return float(val)
+        return 1
+
+    completed = [wi for wi in items if wi["fields"].get("System.State", "").lower() in {"closed", "done", "resolved"}]
+    load = {}
+    for wi in items:
+        name = wi["fields"]["System.AssignedTo"]["displayName"]
+        load[name] = load.get(name, 0) + effort(wi)
+    durations = []
+    for wi in completed:
+        start = parse_dt(wi["fields"]["System.CreatedDate"])
+        end = parse_dt(wi["fields"]["Microsoft.VSTS.Common.ClosedDate"])
+        durations.append((end - start).total_seconds() / 3600)
+    return len(completed), sum(effort(wi) for wi in items), load, sum(durations)
+
+
+def frame_aggregate(frame):
+    completed = frame.completed()
+    return len(completed), frame.effort_total(), frame.load_by_assignee(), sum(completed.cycle_times_hours())
+
+
+def interleaved(variants: dict, rounds=15) -> dict:
+    """Alternate the variants for `rounds` rounds; (last result, min, median seconds) per label."""
+    times = {label: [] for label in variants}
+    results = {}
+    for _ in range(rounds):
+        for label, fn in variants.items():
+            started = time.perf_counter()
+            results[label] = fn()
+            times[label].append(time.perf_counter() - started)
+    for label, samples in times.items():
+        print(f"{label:<32} min {min(samples) * 1000:8.1f} ms   median {statistics.median(samples) * 1000:8.1f} ms")
+    return {label: (results[label], min(times[label]), statistics.median(times[label])) for label in variants}
+
+
+def traced(label, fn):
+    tracemalloc.start()
+    result = fn()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<32} retained {retained / 1024:9.1f} KiB   peak {peak / 1024:9.1f} KiB")
+    return result
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    payload = make_payload(n)
+    print(f"{n} work items, payload {len(payload) / 1024:.0f} KiB\n")
+
+    items = json.loads(payload)["value"]
+    print("CPU (JSON parsing is common to both and excluded)")
+    frame = WorkItemFrame.from_items(items)
+    runs = interleaved({
+        "aggregate over dicts": lambda: dict_aggregate(items),
+        "build + aggregate over frame": lambda: frame_aggregate(WorkItemFrame.from_items(items)),
+        "  of which build": lambda: WorkItemFrame.from_items(items),
+        "  of which aggregate": lambda: frame_aggregate(frame),
+    })
+    expected, dict_time, _ = runs["aggregate over dicts"]
+    actual, frame_time, _ = runs["build + aggregate over frame"]
+    print(f"frame path runs at {dict_time / frame_time:.2f}x the speed of the dict path (min vs. min)\n")
+
+    print("Memory")
+    traced("parsed dicts", lambda: json.loads(payload)["value"])
+    traced("WorkItemFrame", lambda: WorkItemFrame.from_items(items))
+
+    assert expected[0] == actual[0] and expected[2] == actual[2]
+    assert abs(expected[1] - actual[1]) < 1e-6 and abs(expected[3] - actual[3]) < 1e-3
+    print("\nresults match")
+
+
+if __name__ == "__main__":
+    main()
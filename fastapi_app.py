@@ -3,9 +3,24 @@ from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.requests import Request as StarletteRequest
 import asyncio
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 import asyncio
-from AIToolkitDevops import MCPClient
+import base64
+import itertools
+import json
+import os
+import statistics
+from datetime import datetime, timedelta, timezone
+from AIToolkitDevops import MCPClient, SYSTEM_PROMPT
+from admission import BACKGROUND, INTERACTIVE
+from azure.ai.inference.models import SystemMessage, TextContentItem, UserMessage
+from job_queue import Job, JobQueue, QueueFullError
+from kpi_stream import KPIBroadcaster
+from prefetch import Prefetcher
+from pr_analytics import THREADS_TOOL, PRAnalyticsCache
+from workitem_frame import WorkItemFrame, format_epoch, parse_dt
+from workitem_query import FRAME_FIELDS, ROW_FIELDS, WIQL_TOOL, completed_wiql, iteration_wiql_path, query_ids
 
 
 
@@ -32,6 +47,32 @@ app.add_middleware(TimeoutMiddleware, timeout=60)
 app.state.mcp_client = None
 app.state.mcp_lock = asyncio.Lock()
 
+# Velocity of closed sprints never changes, so it is cached on disk across restarts
+VELOCITY_CACHE_PATH = os.environ.get(
+    "VELOCITY_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".velocity_cache.json"),
+)
+VELOCITY_CONCURRENCY = int(os.environ.get("VELOCITY_CONCURRENCY", "4"))
+app.state.velocity_cache = None
+
+# Incrementally refreshed PR aggregates, one per project
+PR_ANALYTICS_CONCURRENCY = int(os.environ.get("PR_ANALYTICS_CONCURRENCY", "4"))
+app.state.pr_analytics = {}
+
+# Background warm-up of the views users usually open next (see prefetch.py)
+prefetcher = Prefetcher(
+    concurrency=int(os.environ.get("PREFETCH_CONCURRENCY", "2")),
+    ttl=float(os.environ.get("PREFETCH_TTL_SECONDS", "60")),
+    enabled=os.environ.get("PREFETCH_ENABLED", "1").lower() not in ("0", "false", "no"),
+)
+
+
+@app.middleware("http")
+async def track_foreground(request: Request, call_next):
+    # Prefetches wait while user requests are being answered
+    with prefetcher.foreground():
+        return await call_next(request)
+
 
 # Allow frontend dev server
 app.add_middleware(
@@ -40,6 +81,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # NDJSON listings carry their paging metadata in headers (see ndjson_response)
+    expose_headers=["X-Next-Cursor", "X-Total-Count"],
 )
 
 
@@ -48,38 +91,56 @@ class InsightRequest(BaseModel):
     # Optionally add more fields (project, sprint, etc.)
 
 
+class QueryRequest(BaseModel):
+    query: str
+    # Scheduled/batch callers (reports, digests) set this so their model calls yield to interactive chat
+    background: bool = False
+
+
+# With several uvicorn workers, point them all at one `python mcp_gateway.py` process
+MCP_GATEWAY_SOCKET = os.environ.get("MCP_GATEWAY_SOCKET")
+
+
 async def get_mcp_client() -> MCPClient:
     async with app.state.mcp_lock:
         if app.state.mcp_client is None:
             client = MCPClient()
-            await client.connect_stdio_server(
-                "azure devops",
-                "npx",
-                ["-y", "@azure-devops/mcp", "DevOpsAssistant"],
-                {}
-            )
+            if MCP_GATEWAY_SOCKET:
+                await client.connect_gateway("azure devops", MCP_GATEWAY_SOCKET)
+            else:
+                await client.connect_stdio_server(
+                    "azure devops",
+                    "npx",
+                    ["-y", "@azure-devops/mcp", "DevOpsAssistant"],
+                    {}
+                )
             app.state.mcp_client = client
         return app.state.mcp_client
 
 
 @app.on_event("shutdown")
 async def shutdown_event():
+    await kpi_broadcaster.close()
+    await query_jobs.close()
+    await prefetcher.close()
     if app.state.mcp_client is not None:
         await app.state.mcp_client.cleanup()
         app.state.mcp_client = None
 
 
-def flatten_iterations(iterations):
-    flat = []
-    def walk(node):
+def walk_iterations(iterations):
+    """Depth-first generator over the iteration tree (parents before children)"""
+    stack = list(reversed(iterations or []))
+    while stack:
+        node = stack.pop()
         if not isinstance(node, dict):
-            return
-        flat.append(node)
-        for child in node.get("children", []) or []:
-            walk(child)
-    for n in iterations or []:
-        walk(n)
-    return flat
+            continue
+        yield node
+        stack.extend(reversed(node.get("children", []) or []))
+
+
+def flatten_iterations(iterations):
+    return list(walk_iterations(iterations))
 
 
 def find_iteration(iterations, sprint_id):
@@ -99,6 +160,38 @@ def find_iteration(iterations, sprint_id):
     return None
 
 
+def summarize_sprints(iterations):
+    """Flatten the iteration tree into dated sprint summaries with past/current/future status"""
+    return list(iter_sprints(iterations))
+
+
+def iter_sprints(iterations):
+    for node in walk_iterations(iterations):
+        # Skip parent iteration containers (they have children and no dates)
+        if node.get("hasChildren") and not node.get("attributes"):
+            continue
+            
+        attrs = node.get("attributes", {}) or {}
+        time_frame = (attrs.get("timeFrame") or "").lower()
+        if time_frame == "current":
+            status = "current"
+        elif time_frame == "future":
+            status = "future"
+        else:
+            status = "past"
+        
+        # Use identifier as primary ID (this is the GUID used by team iteration APIs)
+        sprint_id = node.get("identifier") or node.get("id") or node.get("name")
+        
+        yield {
+            "id": str(sprint_id),
+            "name": node.get("name"),
+            "startDate": attrs.get("startDate") or "",
+            "endDate": attrs.get("finishDate") or "",
+            "status": status,
+        }
+
+
 def normalize_work_items(raw):
     if isinstance(raw, dict):
         # Handle workItemRelations format (from wit_get_work_items_for_iteration)
@@ -136,17 +229,189 @@ def extract_work_item_ids(items):
     return result
 
 
+# Azure DevOps caps batch requests at 200 work items
+WORK_ITEM_BATCH_SIZE = 200
+
+
+def tool_payload(resp, tool):
+    """JSON payload of an MCP tool result; raises on an error result or an unparseable payload"""
+    if getattr(resp, "isError", False):
+        detail = " ".join(getattr(c, "text", "") or "" for c in resp.content or [])
+        raise RuntimeError(f"{tool} failed: {detail[:300]}")
+    payload = MCPClient.extract_json_from_mcp_response(resp.content)
+    if payload is None:
+        raise RuntimeError(f"{tool} returned no JSON payload")
+    return payload
+
+
+async def fetch_iteration_work_item_ids(session, project, team_id, iteration_id):
+    iter_resp = await session.call_tool(
+        "wit_get_work_items_for_iteration",
+        {"project": project, "team": team_id, "iterationId": str(iteration_id)}
+    )
+    iter_items = tool_payload(iter_resp, "wit_get_work_items_for_iteration")
+    return extract_work_item_ids(normalize_work_items(iter_items))
+
+
+async def iter_work_item_batches(session, project, ids, fields=None, batch_size=WORK_ITEM_BATCH_SIZE):
+    """Yield work items one batch at a time, fetching the next batch while the caller consumes this one.
+
+    `fields` limits each document to those fields (None fetches everything).
+    """
+    args = {"project": project}
+    if fields:
+        args["fields"] = list(fields)
+
+    async def fetch(chunk):
+        resp = await session.call_tool("wit_get_work_items_batch_by_ids", {**args, "ids": chunk})
+        return normalize_work_items(tool_payload(resp, "wit_get_work_items_batch_by_ids"))
+
+    chunks = [ids[i:i + batch_size] for i in range(0, len(ids), batch_size)]
+    pending = asyncio.create_task(fetch(chunks[0])) if chunks else None
+    try:
+        for i in range(len(chunks)):
+            batch = await pending
+            pending = asyncio.create_task(fetch(chunks[i + 1])) if i + 1 < len(chunks) else None
+            yield batch
+    finally:
+        if pending is not None:
+            pending.cancel()
+
+
+async def fetch_completed_frame(client, project, team_id, sprint):
+    """Completed work items of a team's sprint, filtered server-side by WIQL when the MCP server offers it.
+
+    The WIQL query is project-wide and would also match other teams' items in the same iteration,
+    so only IDs that the team's iteration query returns too are batch-fetched.
+    """
+    session = client._servers["azure devops"]["session"]
+    iteration_path = iteration_wiql_path(sprint.get("path"))
+    iteration_ids = fetch_iteration_work_item_ids(session, project, team_id, sprint.get("identifier"))
+    if iteration_path and WIQL_TOOL in client._tool_to_server_map:
+        ids, completed = await asyncio.gather(
+            iteration_ids,
+            query_ids(session, MCPClient.extract_json_from_mcp_response, project, completed_wiql(project, iteration_path)),
+            return_exceptions=True,
+        )
+        if isinstance(ids, Exception):
+            raise ids
+        if not isinstance(completed, Exception):
+            completed = {str(wi_id) for wi_id in completed}
+            return await fetch_work_item_frame(session, project, [wi_id for wi_id in ids if str(wi_id) in completed])
+        print(f"[DEBUG] WIQL query failed, filtering the iteration fetch locally: {completed}")
+    else:
+        ids = await iteration_ids
+    return (await fetch_work_item_frame(session, project, ids)).completed()
+
+
+async def fetch_work_item_frame(session, project, ids, fields=FRAME_FIELDS):
+    frame = WorkItemFrame.from_items([])
+    async for batch in iter_work_item_batches(session, project, ids, fields):
+        frame.extend(batch)
+    return frame
+
+
+def work_item_row(wi):
+    """Flat listing row for a work item"""
+    fields = wi.get("fields", {}) if isinstance(wi, dict) else {}
+    assigned = fields.get("System.AssignedTo")
+    if isinstance(assigned, dict):
+        assigned = assigned.get("displayName") or assigned.get("uniqueName")
+    effort = None
+    for key in ("Microsoft.VSTS.Scheduling.Effort", "Microsoft.VSTS.Scheduling.StoryPoints"):
+        if isinstance(fields.get(key), (int, float)):
+            effort = fields[key]
+            break
+    return {
+        "id": fields.get("System.Id", wi.get("id") if isinstance(wi, dict) else None),
+        "title": fields.get("System.Title"),
+        "type": fields.get("System.WorkItemType"),
+        "state": fields.get("System.State"),
+        "assignedTo": assigned or "Unassigned",
+        "effort": effort,
+        "createdDate": fields.get("System.CreatedDate"),
+        "closedDate": fields.get("Microsoft.VSTS.Common.ClosedDate"),
+        "iterationPath": fields.get("System.IterationPath"),
+    }
+
+
+def encode_cursor(offset):
+    return base64.urlsafe_b64encode(json.dumps({"o": offset}).encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor):
+    if not cursor:
+        return 0
+    try:
+        offset = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))["o"]
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor.")
+    if not isinstance(offset, int) or offset < 0:
+        raise HTTPException(status_code=400, detail="Invalid cursor.")
+    return offset
+
+
+async def ndjson_lines(rows):
+    """Encode an (async) iterable of rows as newline-delimited JSON"""
+    if hasattr(rows, "__aiter__"):
+        async for row in rows:
+            yield json.dumps(row) + "\n"
+    else:
+        for row in rows:
+            yield json.dumps(row) + "\n"
+
+
+def next_cursor(offset, limit, total):
+    if limit is None or offset + limit >= total:
+        return None
+    return encode_cursor(offset + limit)
+
+
+def ndjson_response(rows, total, cursor):
+    """Stream rows as NDJSON; paging metadata goes in headers since the body is just rows"""
+    headers = {"X-Total-Count": str(total)}
+    if cursor:
+        headers["X-Next-Cursor"] = cursor
+    return StreamingResponse(ndjson_lines(rows), media_type="application/x-ndjson", headers=headers)
+
+
 @app.post("/api/devops-insight")
 async def devops_insight(req: InsightRequest):
     client = await get_mcp_client()
-    # Use orchestrator for insights
-    handled = await client.handle_insight_intent(req.prompts)
-    # For demo, just return handled status
-    return {"handled": handled}
+    # Deterministic fast path: one round of parallel tool calls, no model
+    insight = await client.handle_insight_intent(req.prompts)
+    if insight is None:
+        return {"handled": False, "insight": None}
+    return {"handled": True, "insight": insight.to_dict()}
+
+
+@app.get("/api/usage")
+async def usage_stats():
+    """Per-prompt token and latency aggregates for model round-trips."""
+    client = app.state.mcp_client
+    if client is None:
+        return {"prompts": [], "evictedPrompts": 0, "lastConversation": None, "toolResults": [], "tiers": {}}
+    last = client.last_conversation
+    return {
+        "prompts": client.get_usage_stats(),
+        "evictedPrompts": client._usage_evicted,
+        "lastConversation": last.to_dict() if last else None,
+        "toolResults": client.get_tool_result_stats(),
+        "tiers": client.get_tier_stats(),
+    }
 
 
 @app.get("/api/dashboard")
 async def dashboard():
+    data = await load_dashboard()
+    # Home is usually followed by the Sprints and Code Reviews pages
+    client = await get_mcp_client()
+    prefetcher.schedule(("iterations", "VAIDMS"), lambda: prefetch_iterations(client, "VAIDMS"))
+    prefetcher.schedule(("code-reviews", "VAIDMS"), lambda: load_code_review_analytics(client, "VAIDMS"))
+    return data
+
+
+async def load_dashboard():
     client = await get_mcp_client()
     
     project = "VAIDMS"
@@ -187,47 +452,22 @@ async def dashboard():
     open_prs = len(prs) if prs else 0
 
     # Fetch completed items for current sprint using iteration ID
-    completed_items = 0
-    completed = []
+    completed = WorkItemFrame.from_items([])
     
     if team_id and current_sprint:
         sprint_identifier = current_sprint.get("identifier")
         
         if sprint_identifier:
-            # Use wit_get_work_items_for_iteration (same as your working MCP test)
-            iter_payload = {
-                "project": project,
-                "team": team_id,
-                "iterationId": str(sprint_identifier),
-            }
-            iter_resp = await client._servers["azure devops"]["session"].call_tool(
-                "wit_get_work_items_for_iteration",
-                iter_payload
-            )
-            iter_items = MCPClient.extract_json_from_mcp_response(iter_resp.content)
-            iter_list = normalize_work_items(iter_items)
-            
-            iter_ids = extract_work_item_ids(iter_list)
-            if iter_ids:
-                batch_resp = await client._servers["azure devops"]["session"].call_tool(
-                    "wit_get_work_items_batch_by_ids",
-                    {"project": project, "ids": iter_ids}
-                )
-                batch_items = MCPClient.extract_json_from_mcp_response(batch_resp.content)
-                all_items = normalize_work_items(batch_items)
-                
-                # Filter for closed items
-                completed = [wi for wi in all_items if wi.get("fields", {}).get("System.State", "").lower() in {"closed", "done", "resolved"}]
-                completed_items = len(completed)
+            try:
+                completed = await fetch_completed_frame(client, project, team_id, current_sprint)
+            except Exception as e:
+                # Degrade to zero completed items rather than failing the dashboard and every KPI poll
+                print(f"[DEBUG] Error fetching completed items for the dashboard: {e}")
+                completed = WorkItemFrame.from_items([])
+
+    completed_items = len(completed)
 
     # Avg. Resolution (in hours)
-    from datetime import datetime, timedelta
-    def parse_dt(dt):
-        try:
-            return datetime.fromisoformat(dt.replace('Z', '+00:00'))
-        except Exception:
-            return None
-    
     pr_durations = []
     if prs:
         for pr in prs:
@@ -237,39 +477,12 @@ async def dashboard():
                 if start and end:
                     pr_durations.append((end - start).total_seconds() / 3600)
     
-    wi_durations = []
-    if completed:
-        for wi in completed:
-            if not isinstance(wi, dict):
-                continue
-            fields = wi.get("fields", {})
-            created = fields.get("System.CreatedDate")
-            closed = fields.get("Microsoft.VSTS.Common.ClosedDate")
-            if created and closed:
-                start = parse_dt(created)
-                end = parse_dt(closed)
-                if start and end:
-                    wi_durations.append((end - start).total_seconds() / 3600)
-    
-    all_durations = pr_durations + wi_durations
+    all_durations = pr_durations + completed.cycle_times_hours()
     avg_resolution = round(sum(all_durations) / len(all_durations), 1) if all_durations else 0
 
     # Velocity Trend
-    from collections import defaultdict
-    import pytz
-    velocity = defaultdict(int)
-    now = datetime.utcnow().replace(tzinfo=pytz.UTC)
-    
-    for wi in completed:
-        if not isinstance(wi, dict):
-            continue
-        fields = wi.get("fields", {})
-        closed = fields.get("Microsoft.VSTS.Common.ClosedDate")
-        if closed:
-            dt = parse_dt(closed)
-            if dt:
-                year, week, _ = dt.isocalendar()
-                velocity[(year, week)] += 1
+    velocity = completed.closed_by_week()
+    now = datetime.now(timezone.utc)
     
     trend = []
     if current_sprint and current_sprint.get('attributes', {}).get('startDate') and current_sprint.get('attributes', {}).get('finishDate'):
@@ -302,20 +515,12 @@ async def dashboard():
                 "timestamp": pr.get('creationDate', '')
             })
     
-    if completed:
-        count = 0
-        for wi in completed:
-            if not isinstance(wi, dict):
-                continue
-            fields = wi.get("fields", {})
-            activity.append({
-                "type": "workitem",
-                "title": f"Work Item #{fields.get('System.Id', '')} Closed",
-                "timestamp": fields.get("Microsoft.VSTS.Common.ClosedDate", "")
-            })
-            count += 1
-            if count >= 5:
-                break
+    for i in range(min(len(completed), 5)):
+        activity.append({
+            "type": "workitem",
+            "title": f"Work Item #{completed.ids[i] or ''} Closed",
+            "timestamp": format_epoch(completed.closed[i])
+        })
     
     activity = sorted(activity, key=lambda x: x['timestamp'], reverse=True)[:7]
 
@@ -343,52 +548,80 @@ async def dashboard():
     }
 
 
-@app.get("/api/sprints")
-async def list_sprints():
-    client = await get_mcp_client()
-    project = "VAIDMS"
+async def fetch_iterations(client, project):
     sprints_resp = await client._servers["azure devops"]["session"].call_tool(
         "work_list_iterations",
         {"project": project}
     )
-    sprints = MCPClient.extract_json_from_mcp_response(sprints_resp.content)
-    flat = flatten_iterations(sprints)
-    result = []
-    for node in flat:
-        # Skip parent iteration containers (they have children and no dates)
-        if node.get("hasChildren") and not node.get("attributes"):
-            continue
-            
-        attrs = node.get("attributes", {}) or {}
-        time_frame = (attrs.get("timeFrame") or "").lower()
-        if time_frame == "current":
-            status = "current"
-        elif time_frame == "future":
-            status = "future"
-        else:
-            status = "past"
-        
-        # Use identifier as primary ID (this is the GUID used by team iteration APIs)
-        sprint_id = node.get("identifier") or node.get("id") or node.get("name")
-        
-        result.append({
-            "id": str(sprint_id),
-            "name": node.get("name"),
-            "startDate": attrs.get("startDate") or "",
-            "endDate": attrs.get("finishDate") or "",
-            "status": status,
-        })
-    return result
+    return MCPClient.extract_json_from_mcp_response(sprints_resp.content)
 
 
-@app.get("/api/sprints/{sprint_id}/insights")
-async def sprint_insights(sprint_id: str):
-    client = await get_mcp_client()
-    project = "VAIDMS"
+async def prefetch_iterations(client, project):
+    iterations = await fetch_iterations(client, project)
+    schedule_sprint_insights(iterations)
+    return iterations
 
-    print(f"\n[DEBUG] ===== Starting sprint_insights for sprint_id={sprint_id} =====\n")
 
-    teams_resp = await client._servers["azure devops"]["session"].call_tool(
+def schedule_sprint_insights(iterations):
+    """Prefetch insights for the sprint the Sprints page opens first (current, else the first one)"""
+    sprints = summarize_sprints(iterations)
+    sprint = next((s for s in sprints if s["status"] == "current"), sprints[0] if sprints else None)
+    if sprint is not None:
+        sprint_id = sprint["id"]
+        prefetcher.schedule(("sprint-insights", sprint_id), lambda: compute_sprint_insights(sprint_id))
+
+
+@app.get("/api/sprints")
+async def list_sprints(cursor: str = None, limit: int = None, format: str = "json"):
+    """All sprints as an array; with `limit`/`cursor` a page ({items, nextCursor}); `format=ndjson` streams rows"""
+    client = await get_mcp_client()
+    project = "VAIDMS"
+    sprints = await prefetcher.get(("iterations", project), lambda: fetch_iterations(client, project))
+    schedule_sprint_insights(sprints)
+    if cursor is None and limit is None and format != "ndjson":
+        return summarize_sprints(sprints)
+
+    offset = decode_cursor(cursor)
+    if limit is not None:
+        limit = max(1, min(limit, 500))
+    total = sum(1 for _ in iter_sprints(sprints))
+    stop = offset + limit if limit is not None else None
+    page = itertools.islice(iter_sprints(sprints), offset, stop)
+    if format == "ndjson":
+        return ndjson_response(page, total, next_cursor(offset, limit, total))
+    return {"items": list(page), "nextCursor": next_cursor(offset, limit, total)}
+
+
+@app.get("/api/sprints/{sprint_id}/work-items")
+async def sprint_work_items(sprint_id: str, cursor: str = None, limit: int = 200, format: str = "json"):
+    """Work items of a sprint, paged by cursor; `format=ndjson` streams each batch as it arrives"""
+    client = await get_mcp_client()
+    project = "VAIDMS"
+    session = client._servers["azure devops"]["session"]
+    team_id, _, iteration_id = await resolve_team_iteration(client, project, sprint_id)
+
+    offset = decode_cursor(cursor)
+    limit = max(1, min(limit, 5000 if format == "ndjson" else 1000))
+    ids = await fetch_iteration_work_item_ids(session, project, team_id, iteration_id)
+    page_ids = ids[offset:offset + limit]
+
+    if format == "ndjson":
+        async def rows():
+            async for batch in iter_work_item_batches(session, project, page_ids, ROW_FIELDS):
+                for wi in batch:
+                    yield work_item_row(wi)
+        return ndjson_response(rows(), len(ids), next_cursor(offset, limit, len(ids)))
+
+    items = []
+    async for batch in iter_work_item_batches(session, project, page_ids, ROW_FIELDS):
+        items.extend(work_item_row(wi) for wi in batch)
+    return {"items": items, "nextCursor": next_cursor(offset, limit, len(ids)), "total": len(ids)}
+
+
+async def resolve_team_iteration(client, project, sprint_id):
+    """(team_id, sprint node, team iteration ID) for a sprint ID/identifier/path/name; 404 if any is missing"""
+    session = client._servers["azure devops"]["session"]
+    teams_resp = await session.call_tool(
         "core_list_project_teams",
         {"project": project}
     )
@@ -398,7 +631,7 @@ async def sprint_insights(sprint_id: str):
         raise HTTPException(status_code=404, detail="No team found for project.")
 
     # Fetch all iterations to find the requested sprint
-    sprints_resp = await client._servers["azure devops"]["session"].call_tool(
+    sprints_resp = await session.call_tool(
         "work_list_iterations",
         {"project": project}
     )
@@ -410,7 +643,7 @@ async def sprint_insights(sprint_id: str):
     print(f"[DEBUG] Found sprint: {sprint.get('name')} (id={sprint.get('id')}, identifier={sprint.get('identifier')})")
 
     # Get team iterations to find the matching team iteration ID
-    team_iters_resp = await client._servers["azure devops"]["session"].call_tool(
+    team_iters_resp = await session.call_tool(
         "work_list_team_iterations",
         {"project": project, "team": team_id}
     )
@@ -446,103 +679,58 @@ async def sprint_insights(sprint_id: str):
         print(f"[DEBUG] ✗ No matching team iteration found for sprint {sprint.get('name')}")
         raise HTTPException(status_code=404, detail=f"Team iteration not found for sprint '{sprint.get('name')}'")
 
+    return team_id, sprint, iteration_id
+
+
+@app.get("/api/sprints/{sprint_id}/insights")
+async def sprint_insights(sprint_id: str):
+    return await prefetcher.get(("sprint-insights", sprint_id), lambda: compute_sprint_insights(sprint_id))
+
+
+async def compute_sprint_insights(sprint_id: str):
+    client = await get_mcp_client()
+    project = "VAIDMS"
+
+    print(f"\n[DEBUG] ===== Starting sprint_insights for sprint_id={sprint_id} =====\n")
+
+    team_id, sprint, iteration_id = await resolve_team_iteration(client, project, sprint_id)
+
     # Fetch work items using wit_get_work_items_for_iteration (WORKING METHOD from your MCP test)
-    all_items = []
+    frame = WorkItemFrame.from_items([])
     print(f"[DEBUG] Fetching work items for iterationId={iteration_id}")
     
-    iter_payload = {
-        "project": project,
-        "team": team_id,
-        "iterationId": str(iteration_id),
-    }
+    session = client._servers["azure devops"]["session"]
     
     try:
-        iter_resp = await client._servers["azure devops"]["session"].call_tool(
-            "wit_get_work_items_for_iteration",
-            iter_payload
-        )
-        iter_items = MCPClient.extract_json_from_mcp_response(iter_resp.content)
-        iter_list = normalize_work_items(iter_items)
-        print(f"[DEBUG] Found {len(iter_list)} work item relations from iteration query")
-        
-        iter_ids = extract_work_item_ids(iter_list)
-        print(f"[DEBUG] Extracted work item IDs: {iter_ids}")
+        iter_ids = await fetch_iteration_work_item_ids(session, project, team_id, iteration_id)
+        print(f"[DEBUG] Extracted {len(iter_ids)} work item IDs from iteration query")
         
         if iter_ids:
             print(f"[DEBUG] Fetching detailed info for {len(iter_ids)} work items")
-            batch_resp = await client._servers["azure devops"]["session"].call_tool(
-                "wit_get_work_items_batch_by_ids",
-                {"project": project, "ids": iter_ids}
-            )
-            batch_items = MCPClient.extract_json_from_mcp_response(batch_resp.content)
-            all_items = normalize_work_items(batch_items)
-            print(f"[DEBUG] Successfully fetched {len(all_items)} detailed work items")
+            frame = await fetch_work_item_frame(session, project, iter_ids)
+            print(f"[DEBUG] Successfully fetched {len(frame)} detailed work items")
         else:
             print("[DEBUG] No work item IDs extracted from iteration query")
     except Exception as e:
         print(f"[DEBUG] Error fetching work items for iteration: {e}")
-        all_items = []
+        frame = WorkItemFrame.from_items([])
 
-    def parse_dt(dt):
-        try:
-            from datetime import datetime
-            return datetime.fromisoformat(dt.replace("Z", "+00:00"))
-        except Exception:
-            return None
-
-    def get_fields(wi):
-        return wi.get("fields", {}) if isinstance(wi, dict) else {}
-
-    def get_state(wi):
-        if not isinstance(wi, dict):
-            return ""
-        fields = get_fields(wi)
-        return str(fields.get("System.State") or "")
-
-    completed_states = {"closed", "done", "resolved"}
-    completed_items = [wi for wi in all_items if get_state(wi).lower() in completed_states]
-    print(f"[DEBUG] Completed items: {len(completed_items)} out of {len(all_items)}")
+    completed_items = frame.completed()
+    print(f"[DEBUG] Completed items: {len(completed_items)} out of {len(frame)}")
 
-    def get_assignee(wi):
-        if not isinstance(wi, dict):
-            return "Unassigned"
-        fields = get_fields(wi)
-        val = fields.get("System.AssignedTo")
-        if isinstance(val, dict):
-            return val.get("displayName") or val.get("uniqueName") or "Unassigned"
-        if isinstance(val, str):
-            return val
-        return "Unassigned"
-
-    def get_effort(wi):
-        if not isinstance(wi, dict):
-            return 1
-        fields = get_fields(wi)
-        for key in ("Microsoft.VSTS.Scheduling.Effort", "Microsoft.VSTS.Scheduling.StoryPoints"):
-            val = fields.get(key)
-            if isinstance(val, (int, float)):
-                return float(val)
-        return 1
-
-    total_items = len(all_items)
+    total_items = len(frame)
     completed_count = len(completed_items)
     progress = round((completed_count / total_items) * 100, 1) if total_items > 0 else 0
 
-    total_effort = sum(get_effort(wi) for wi in all_items)
-    completed_effort = sum(get_effort(wi) for wi in completed_items)
+    total_effort = frame.effort_total()
+    completed_effort = completed_items.effort_total()
     velocity = round(completed_effort, 1)
 
     print(f"[DEBUG] Metrics - Progress: {progress}%, Velocity: {velocity}, Total items: {total_items}, Completed: {completed_count}")
 
-    member_capacity_map = {}
-    for wi in all_items:
-        assignee = get_assignee(wi)
-        member_capacity_map.setdefault(assignee, 0)
-        member_capacity_map[assignee] += get_effort(wi)
-
     member_capacity = [
         {"name": name, "capacity": 40, "assigned": round(assigned, 1)}
-        for name, assigned in member_capacity_map.items()
+        for name, assigned in frame.load_by_assignee().items()
     ]
 
     burndown_data = []
@@ -550,23 +738,21 @@ async def sprint_insights(sprint_id: str):
     start_dt = parse_dt(attrs.get("startDate") or "")
     finish_dt = parse_dt(attrs.get("finishDate") or "")
     if start_dt and finish_dt:
-        from datetime import timedelta
         start_day = start_dt.date()
         finish_day = finish_dt.date()
         days = (finish_day - start_day).days
         if days < 0:
             days = 0
-        completed_by_day = []
-        for wi in completed_items:
-            fields = get_fields(wi)
-            closed = fields.get("Microsoft.VSTS.Common.ClosedDate")
-            closed_dt = parse_dt(closed) if closed else None
-            if closed_dt:
-                completed_by_day.append((closed_dt.date(), get_effort(wi)))
+        # Sorted by close date, so "done by day N" is a running sum
+        completed_by_day = completed_items.closed_effort_by_day()
+        cursor = 0
+        done = 0.0
 
         for i in range(days + 1):
             day = start_day + timedelta(days=i)
-            done = sum(effort for d, effort in completed_by_day if d <= day)
+            while cursor < len(completed_by_day) and completed_by_day[cursor][0] <= day:
+                done += completed_by_day[cursor][1]
+                cursor += 1
             remaining = max(total_effort - done, 0)
             ideal = total_effort - (total_effort * (i / days)) if days > 0 else 0
             burndown_data.append({
@@ -586,3 +772,228 @@ async def sprint_insights(sprint_id: str):
         "burndownData": burndown_data,
         "memberCapacity": member_capacity,
     }
+
+
+def load_velocity_cache(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return data if isinstance(data, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+
+def save_velocity_cache(path, cache):
+    tmp_path = path + ".tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(cache, f)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"[DEBUG] Could not persist velocity cache to {path}: {e}")
+
+
+def is_sprint_closed(sprint, now):
+    """A past sprint whose finish date has passed; its work items are treated as immutable."""
+    if sprint.get("status") != "past":
+        return False
+    end = parse_dt(sprint.get("endDate"))
+    return end is not None and end < now
+
+
+async def fetch_sprint_velocity(client, project, team_id, sprint_id):
+    """Completed effort/items for one iteration (iteration query + batch fetch)"""
+    session = client._servers["azure devops"]["session"]
+    iter_ids = await fetch_iteration_work_item_ids(session, project, team_id, sprint_id)
+    frame = await fetch_work_item_frame(session, project, iter_ids)
+    completed = frame.completed()
+    return {
+        "velocity": round(completed.effort_total(), 1),
+        "completedItems": len(completed),
+        "totalItems": len(frame),
+    }
+
+
+@app.get("/api/velocity/history")
+async def velocity_history(limit: int = 12, window: int = 3):
+    """Per-sprint velocity for the last `limit` past/current sprints with rolling average and variance"""
+    limit = max(1, min(limit, 20))
+    window = max(1, window)
+    client = await get_mcp_client()
+    project = "VAIDMS"
+    session = client._servers["azure devops"]["session"]
+
+    teams_resp = await session.call_tool("core_list_project_teams", {"project": project})
+    teams = MCPClient.extract_json_from_mcp_response(teams_resp.content)
+    team_id = teams[0]["id"] if teams and len(teams) > 0 else None
+    if not team_id:
+        raise HTTPException(status_code=404, detail="No team found for project.")
+
+    sprints_resp = await session.call_tool("work_list_iterations", {"project": project})
+    sprints = summarize_sprints(MCPClient.extract_json_from_mcp_response(sprints_resp.content))
+    dated = [s for s in sprints if s["status"] in ("past", "current") and parse_dt(s["startDate"])]
+    dated.sort(key=lambda s: parse_dt(s["startDate"]))
+    dated = dated[-limit:]
+
+    if app.state.velocity_cache is None:
+        app.state.velocity_cache = load_velocity_cache(VELOCITY_CACHE_PATH)
+    cache = app.state.velocity_cache
+    now = datetime.now(timezone.utc)
+    semaphore = asyncio.Semaphore(VELOCITY_CONCURRENCY)
+    newly_cached = []
+
+    async def resolve(sprint):
+        key = f"{project}:{team_id}:{sprint['id']}"
+        if key in cache:
+            return {**sprint, **cache[key], "cached": True}
+        try:
+            async with semaphore:
+                stats = await fetch_sprint_velocity(client, project, team_id, sprint["id"])
+        except Exception as e:
+            print(f"[DEBUG] Velocity fetch failed for sprint {sprint['name']}: {e}")
+            return {**sprint, "velocity": None, "completedItems": None, "totalItems": None, "cached": False}
+        # Never persist an empty result: it may be an upstream hiccup rather than an empty sprint
+        if is_sprint_closed(sprint, now) and stats["totalItems"]:
+            cache[key] = stats
+            newly_cached.append(key)
+        return {**sprint, **stats, "cached": False}
+
+    history = await asyncio.gather(*(resolve(s) for s in dated))
+    if newly_cached:
+        save_velocity_cache(VELOCITY_CACHE_PATH, cache)
+
+    velocities = []
+    for entry in history:
+        if entry["velocity"] is not None:
+            velocities.append(entry["velocity"])
+        recent = velocities[-window:]
+        entry["rollingAverage"] = round(sum(recent) / len(recent), 1) if recent else None
+
+    return {
+        "sprints": history,
+        "averageVelocity": round(statistics.fmean(velocities), 1) if velocities else 0,
+        "variance": round(statistics.pvariance(velocities), 2) if len(velocities) > 1 else 0,
+        "stdDev": round(statistics.pstdev(velocities), 2) if len(velocities) > 1 else 0,
+        "window": window,
+    }
+
+
+@app.get("/api/code-reviews/analytics")
+async def code_review_analytics(refresh: bool = False):
+    """PR analytics across all repositories, refreshed incrementally from the last call"""
+    client = await get_mcp_client()
+    project = "VAIDMS"
+    if refresh:
+        return await load_code_review_analytics(client, project, force=True)
+    return await prefetcher.get(("code-reviews", project), lambda: load_code_review_analytics(client, project))
+
+
+async def load_code_review_analytics(client, project, force=False):
+    cache = app.state.pr_analytics.get(project)
+    if cache is None:
+        cache = app.state.pr_analytics[project] = PRAnalyticsCache(project, concurrency=PR_ANALYTICS_CONCURRENCY)
+    stats = await cache.refresh(
+        client._servers["azure devops"]["session"],
+        MCPClient.extract_json_from_mcp_response,
+        force=force,
+        comment_counts=THREADS_TOOL in client._tool_to_server_map,
+    )
+    print(f"[DEBUG] PR analytics refresh: {stats}")
+    return cache.aggregates.summary()
+
+
+async def compute_kpis():
+    """KPI list for the KPIs page, derived from the dashboard aggregates"""
+    data = await load_dashboard()
+    stats = data["stats"]
+    trend = stats.get("velocityTrend") or []
+    return [
+        {"id": "active-sprints", "label": "Active Sprints", "value": stats["activeSprints"]},
+        {"id": "open-prs", "label": "Open Pull Requests", "value": stats["openPRs"]},
+        {"id": "completed-items", "label": "Completed Items", "value": stats["completedItems"]},
+        {"id": "avg-resolution", "label": "Avg. Resolution", "value": stats["avgResolution"], "unit": "h"},
+        {"id": "weekly-throughput", "label": "Closed This Week", "value": trend[-1]["completed"] if trend else 0},
+    ]
+
+
+# One poller for all KPI subscribers; MCP load does not grow with open dashboards
+KPI_INTERVAL = float(os.environ.get("KPI_INTERVAL_SECONDS", "30"))
+kpi_broadcaster = KPIBroadcaster(compute_kpis, interval=KPI_INTERVAL)
+
+
+@app.get("/api/kpis")
+async def list_kpis():
+    return await kpi_broadcaster.get_kpis()
+
+
+@app.get("/api/kpis/stream")
+async def stream_kpis():
+    """Server-sent events: a snapshot on connect, then only changed KPIs"""
+    return StreamingResponse(
+        kpi_broadcaster.stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def run_query_job(job: Job):
+    """Answer a free-form question with the tool-calling model loop"""
+    client = await get_mcp_client()
+    messages = [
+        SystemMessage(content=SYSTEM_PROMPT),
+        UserMessage(content=[TextContentItem(text=job.payload.query)]),
+    ]
+    priority = BACKGROUND if job.payload.background else INTERACTIVE
+    answer = await client.chatWithTools(messages, progress=job.report, priority=priority)
+    return {"answer": answer, "timestamp": datetime.now(timezone.utc).isoformat()}
+
+
+# Caps concurrent chatWithTools loops; extra questions wait in line instead of timing out together
+query_jobs = JobQueue(
+    run_query_job,
+    workers=int(os.environ.get("QUERY_WORKERS", "2")),
+    max_pending=int(os.environ.get("QUERY_MAX_PENDING", "50")),
+    ttl=float(os.environ.get("QUERY_RESULT_TTL_SECONDS", "600")),
+    job_timeout=float(os.environ.get("QUERY_JOB_TIMEOUT_SECONDS", "300")),
+)
+
+
+@app.post("/api/query", status_code=202)
+async def submit_query(req: QueryRequest):
+    try:
+        job = query_jobs.submit(req)
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=f"Assistant is busy: {e}. Try again shortly.")
+    return {"jobId": job.id, "status": job.status, "position": query_jobs.position(job)}
+
+
+@app.get("/api/query/{job_id}")
+async def get_query(job_id: str):
+    job = query_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired.")
+    return {**job.to_dict(), "position": query_jobs.position(job)}
+
+
+@app.get("/api/query/{job_id}/events")
+async def stream_query(job_id: str):
+    """Server-sent progress events for a job, ending with a `result` event"""
+    job = query_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired.")
+    return StreamingResponse(
+        query_jobs.stream(job),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/api/jobs/stats")
+async def job_stats():
+    client = app.state.mcp_client
+    admission = getattr(client, "admission", None)
+    return {
+        **query_jobs.summary(),
+        "admission": admission.summary() if admission else None,
+        "prefetch": prefetcher.summary(),
+    }
@@ -0,0 +1,188 @@
+"""In-process job queue with a bounded pool of async workers.
+
+Long assistant requests are submitted as jobs and return an ID immediately. A fixed
+number of workers drain the queue, so at most ``workers`` model loops run at once and
+bursts queue up instead of piling onto the model. Finished jobs are kept for ``ttl``
+seconds so clients can poll or stream them, then evicted.
+"""
+import asyncio
+import json
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Optional
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+
+class QueueFullError(Exception):
+    """Raised by `JobQueue.submit` when the pending backlog is at capacity."""
+
+
+class Job:
+    def __init__(self, payload: Any):
+        self.id = uuid.uuid4().hex
+        self.payload = payload
+        self.status = QUEUED
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.progress: list[str] = []
+        self.created = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.done = asyncio.Event()
+        self._listeners: set[asyncio.Queue] = set()
+
+    def report(self, message: str):
+        """Record a progress message and push it to any streaming listeners."""
+        self.progress.append(message)
+        for listener in self._listeners:
+            listener.put_nowait(("progress", message))
+
+    def to_dict(self) -> dict:
+        return {
+            "jobId": self.id,
+            "status": self.status,
+            "progress": self.progress,
+            "result": self.result,
+            "error": self.error,
+            "createdAt": self.created,
+            "startedAt": self.started,
+            "finishedAt": self.finished,
+        }
+
+
+class JobQueue:
+    """FIFO job queue drained by ``workers`` async workers.
+
+    Args:
+        handler: coroutine run for each job; its return value becomes ``job.result``
+        workers: maximum number of jobs running concurrently
+        max_pending: queued (not yet running) jobs accepted before `submit` refuses
+        ttl: seconds a finished job stays retrievable
+        job_timeout: per-job wall-clock limit. A job past it is reported as failed at once, but its
+            worker stays occupied until the handler actually returns: model calls run in threads
+            that cannot be cancelled, and freeing the slot early would let more than ``workers``
+            handlers run at once.
+    """
+
+    def __init__(self, handler: Callable[[Job], Awaitable[Any]], workers: int = 2, max_pending: int = 50,
+                 ttl: float = 600.0, job_timeout: float = 300.0):
+        self.handler = handler
+        self.workers = workers
+        self.max_pending = max_pending
+        self.ttl = ttl
+        self.job_timeout = job_timeout
+        self.jobs: dict[str, Job] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: list[asyncio.Task] = []
+        # Handlers of timed-out jobs that are still finishing and holding their worker
+        self._overrunning: set[asyncio.Task] = set()
+        self.stats = {"submitted": 0, "succeeded": 0, "failed": 0, "rejected": 0, "evicted": 0}
+
+    def _ensure_started(self):
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        self._tasks = [t for t in self._tasks if not t.done()]
+        while len(self._tasks) < self.workers:
+            self._tasks.append(asyncio.create_task(self._worker()))
+
+    def submit(self, payload: Any) -> Job:
+        self._ensure_started()
+        self.evict_expired()
+        if self._queue.qsize() >= self.max_pending:
+            self.stats["rejected"] += 1
+            raise QueueFullError(f"{self._queue.qsize()} jobs already queued")
+        job = Job(payload)
+        self.jobs[job.id] = job
+        self._queue.put_nowait(job)
+        self.stats["submitted"] += 1
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        self.evict_expired()
+        return self.jobs.get(job_id)
+
+    def position(self, job: Job) -> int:
+        """1-based place in line for a queued job, 0 once it is running or finished."""
+        if job.status != QUEUED:
+            return 0
+        queued = sorted((j for j in self.jobs.values() if j.status == QUEUED), key=lambda j: j.created)
+        return next((i + 1 for i, j in enumerate(queued) if j is job), 0)
+
+    def evict_expired(self):
+        cutoff = time.time() - self.ttl
+        expired = [job_id for job_id, job in self.jobs.items() if job.finished is not None and job.finished < cutoff]
+        for job_id in expired:
+            del self.jobs[job_id]
+        self.stats["evicted"] += len(expired)
+
+    def summary(self) -> dict:
+        return {
+            "workers": self.workers,
+            "running": sum(1 for j in self.jobs.values() if j.status == RUNNING),
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "overrunning": len(self._overrunning),
+            "retained": len(self.jobs),
+            **self.stats,
+        }
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            job.status = RUNNING
+            job.started = time.time()
+            handler = asyncio.create_task(self.handler(job))
+            try:
+                job.result = await asyncio.wait_for(asyncio.shield(handler), timeout=self.job_timeout)
+                job.status = SUCCEEDED
+                self.stats["succeeded"] += 1
+            except asyncio.TimeoutError:
+                job.status = FAILED
+                job.error = f"Job timed out after {self.job_timeout:g} seconds."
+                self.stats["failed"] += 1
+            except Exception as e:
+                job.status = FAILED
+                job.error = str(e)
+                self.stats["failed"] += 1
+            finally:
+                job.finished = time.time()
+                job.done.set()
+                for listener in job._listeners:
+                    listener.put_nowait(("done", None))
+                if not handler.done():
+                    # Result is discarded; wait it out so the `workers` cap holds
+                    self._overrunning.add(handler)
+                    try:
+                        await asyncio.gather(handler, return_exceptions=True)
+                    finally:
+                        self._overrunning.discard(handler)
+                self._queue.task_done()
+
+    async def stream(self, job: Job, heartbeat: float = 15.0):
+        """SSE frames: past progress, live progress, then a final ``result`` event."""
+        listener: asyncio.Queue = asyncio.Queue()
+        job._listeners.add(listener)
+        try:
+            for message in list(job.progress):
+                yield f"event: progress\ndata: {json.dumps(message)}\n\n"
+            while not job.done.is_set():
+                try:
+                    kind, message = await asyncio.wait_for(listener.get(), timeout=heartbeat)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                if kind == "done":
+                    break
+                yield f"event: progress\ndata: {json.dumps(message)}\n\n"
+            yield f"event: result\ndata: {json.dumps(job.to_dict())}\n\n"
+        finally:
+            job._listeners.discard(listener)
+
+    async def close(self):
+        for task in self._tasks + list(self._overrunning):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
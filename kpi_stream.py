@@ -0,0 +1,161 @@
+"""Server-side KPI poller with diff-based fan-out to SSE subscribers.
+
+One `KPIBroadcaster` computes KPIs once per interval, no matter how many dashboards
+are subscribed. Each refresh is diffed against the previous snapshot. Only changed
+KPIs are serialized, once, and the same encoded message is queued to every subscriber.
+A subscriber that falls behind has its backlog replaced by a full snapshot rather than
+growing without bound.
+"""
+import asyncio
+import json
+import time
+from typing import Awaitable, Callable, Optional
+
+
+def _trend(old, new) -> float:
+    """Percentage change between two numeric KPI values (0 when not comparable)."""
+    if isinstance(old, (int, float)) and isinstance(new, (int, float)) and old:
+        return round((new - old) / abs(old) * 100, 1)
+    return 0
+
+
+def sse_event(event: str, data: str) -> str:
+    return f"event: {event}\ndata: {data}\n\n"
+
+
+class Subscriber:
+    __slots__ = ("queue",)
+
+    def __init__(self, queue_size: int):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+
+
+class KPIBroadcaster:
+    """Single poller that owns the KPI snapshot and pushes diffs to subscribers.
+
+    Args:
+        compute: coroutine returning a list of KPI dicts (``id``, ``label``, ``value``, optional ``unit``)
+        interval: seconds between refreshes while anyone is subscribed
+        queue_size: pending messages per subscriber before it is resynced with a snapshot
+    """
+
+    def __init__(self, compute: Callable[[], Awaitable[list]], interval: float = 30.0, queue_size: int = 8):
+        self.compute = compute
+        self.interval = interval
+        self.queue_size = queue_size
+        self.snapshot: dict[str, dict] = {}
+        self.version = 0
+        self.updated_at = 0.0
+        self.subscribers: set[Subscriber] = set()
+        self.stats = {"refreshes": 0, "broadcasts": 0, "resyncs": 0, "errors": 0}
+        self._task: Optional[asyncio.Task] = None
+        self._refresh_lock = asyncio.Lock()
+
+    def kpis(self) -> list:
+        return list(self.snapshot.values())
+
+    def snapshot_message(self) -> str:
+        return sse_event("snapshot", json.dumps({"version": self.version, "kpis": self.kpis()}))
+
+    async def refresh(self) -> Optional[str]:
+        """Recompute KPIs, update the snapshot and broadcast the diff. Returns the diff message, if any."""
+        async with self._refresh_lock:
+            return await self._refresh_locked()
+
+    async def _refresh_locked(self) -> Optional[str]:
+        fresh = await self.compute()
+        self.stats["refreshes"] += 1
+        self.updated_at = time.monotonic()
+        changed = []
+        next_snapshot = {}
+        for kpi in fresh:
+            old = self.snapshot.get(kpi["id"])
+            if old is not None and old.get("value") == kpi.get("value") and old.get("label") == kpi.get("label"):
+                next_snapshot[kpi["id"]] = old
+                continue
+            kpi = dict(kpi)
+            kpi.setdefault("trend", _trend(old.get("value"), kpi.get("value")) if old else 0)
+            next_snapshot[kpi["id"]] = kpi
+            changed.append(kpi)
+        removed = [kpi_id for kpi_id in self.snapshot if kpi_id not in next_snapshot]
+        self.snapshot = next_snapshot
+        if not changed and not removed:
+            return None
+        self.version += 1
+        message = sse_event("diff", json.dumps({"version": self.version, "changed": changed, "removed": removed}))
+        self.publish(message)
+        return message
+
+    def _stale(self, max_age: float) -> bool:
+        return not self.snapshot or time.monotonic() - self.updated_at > max_age
+
+    def publish(self, message: str):
+        """Queue one pre-encoded message to every subscriber."""
+        self.stats["broadcasts"] += 1
+        for sub in self.subscribers:
+            try:
+                sub.queue.put_nowait(message)
+            except asyncio.QueueFull:
+                # Too far behind for diffs to be useful: drop the backlog and resync
+                while not sub.queue.empty():
+                    sub.queue.get_nowait()
+                sub.queue.put_nowait(self.snapshot_message())
+                self.stats["resyncs"] += 1
+
+    async def get_kpis(self, max_age: Optional[float] = None) -> list:
+        """Current KPIs, refreshing first when the snapshot is empty or older than ``max_age``."""
+        max_age = self.interval if max_age is None else max_age
+        if self._stale(max_age):
+            async with self._refresh_lock:
+                # Concurrent callers queue on the lock; only the first one recomputes
+                if self._stale(max_age):
+                    await self._refresh_locked()
+        return self.kpis()
+
+    def subscribe(self) -> Subscriber:
+        sub = Subscriber(self.queue_size)
+        if self.snapshot:
+            sub.queue.put_nowait(self.snapshot_message())
+        self.subscribers.add(sub)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        return sub
+
+    def unsubscribe(self, sub: Subscriber):
+        self.subscribers.discard(sub)
+
+    async def _run(self):
+        # Poll only while someone is listening; GET /api/kpis refreshes on demand otherwise
+        while self.subscribers:
+            delay = self.interval
+            if not self.snapshot or time.monotonic() - self.updated_at >= self.interval:
+                try:
+                    await self.refresh()
+                except Exception as e:
+                    self.stats["errors"] += 1
+                    print(f"[DEBUG] KPI refresh failed: {e}")
+            else:
+                delay = max(self.interval - (time.monotonic() - self.updated_at), 0.05)
+            await asyncio.sleep(delay)
+
+    async def stream(self, heartbeat: float = 15.0):
+        """Async generator of SSE frames for one subscriber (used by StreamingResponse)."""
+        sub = self.subscribe()
+        try:
+            while True:
+                try:
+                    yield await asyncio.wait_for(sub.queue.get(), timeout=heartbeat)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+        finally:
+            self.unsubscribe(sub)
+
+    async def close(self):
+        self.subscribers.clear()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
@@ -0,0 +1,355 @@
+"""Shared MCP gateway for multi-worker deployments.
+
+With several uvicorn workers, each process would otherwise start its own
+``npx @azure-devops/mcp`` subprocess and keep its own cache. The gateway is one
+process that owns the MCP sessions, the tool catalog and a TTL cache of read-only
+tool responses. It serves every worker over a local Unix socket. Identical concurrent
+calls are coalesced into one upstream call.
+
+Frames are a 4-byte big-endian length, a 1-byte codec tag (``m`` msgpack, ``j`` JSON)
+and the encoded body. msgpack is used when installed; JSON otherwise.
+
+Run the gateway:
+> python mcp_gateway.py --socket /tmp/devops-mcp.sock
+then start the API with MCP_GATEWAY_SOCKET=/tmp/devops-mcp.sock.
+"""
+import asyncio
+import itertools
+import json
+import os
+import struct
+import time
+from collections import OrderedDict
+from contextlib import AsyncExitStack
+from typing import Any, Optional
+
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.stdio import stdio_client
+from mcp.types import CallToolResult, ListToolsResult
+
+try:
+    import msgpack
+except ImportError:
+    # msgpack is optional; JSON frames are larger but otherwise equivalent
+    msgpack = None
+
+DEFAULT_SOCKET = "/tmp/devops-mcp.sock"
+_HEADER = struct.Struct(">IB")
+_MAX_FRAME = 64 * 1024 * 1024
+# Tool-name words marking calls that only read data and are safe to cache
+_READ_ONLY_WORDS = {"get", "list", "search", "query"}
+
+
+def encode_frame(message: dict) -> bytes:
+    if msgpack is not None:
+        body, tag = msgpack.packb(message, use_bin_type=True), ord("m")
+    else:
+        body, tag = json.dumps(message, separators=(",", ":")).encode("utf-8"), ord("j")
+    return _HEADER.pack(len(body), tag) + body
+
+
+async def read_frame(reader: asyncio.StreamReader) -> Optional[dict]:
+    """Next message from the stream, or None on a clean EOF."""
+    try:
+        header = await reader.readexactly(_HEADER.size)
+    except asyncio.IncompleteReadError:
+        return None
+    length, tag = _HEADER.unpack(header)
+    if length > _MAX_FRAME:
+        raise ValueError(f"Gateway frame of {length} bytes exceeds limit")
+    body = await reader.readexactly(length)
+    if tag == ord("m"):
+        if msgpack is None:
+            raise ValueError("Received a msgpack frame but msgpack is not installed")
+        return msgpack.unpackb(body, raw=False)
+    return json.loads(body)
+
+
+def is_cacheable(tool_name: str) -> bool:
+    return bool(_READ_ONLY_WORDS.intersection(tool_name.lower().split("_")))
+
+
+class TTLCache:
+    """Bounded cache whose entries all expire `ttl` seconds after they were stored.
+
+    Args:
+        ttl: seconds an entry is served
+        max_entries: entries kept before the oldest are dropped
+    """
+
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.evictions = 0
+        # Insertion order is expiry order, since every entry gets the same TTL
+        self._entries: "OrderedDict[Any, tuple[float, Any]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key):
+        """The live value for `key`, or None (an expired entry is dropped)."""
+        hit = self._entries.get(key)
+        if hit is None:
+            return None
+        if hit[0] > time.monotonic():
+            return hit[1]
+        del self._entries[key]
+        return None
+
+    def put(self, key, value):
+        now = time.monotonic()
+        self._entries.pop(key, None)
+        self._entries[key] = (now + self.ttl, value)
+        # Drop expired entries from the old end, then the oldest live ones beyond the size cap
+        while self._entries:
+            oldest_key, (expires, _) = next(iter(self._entries.items()))
+            if expires > now and len(self._entries) <= self.max_entries:
+                break
+            del self._entries[oldest_key]
+            self.evictions += 1
+
+
+class UpstreamServers:
+    """MCP sessions the gateway proxies to, without MCPClient's model clients and admission setup.
+
+    Exposes the same ``_servers`` mapping (server ID -> ``{"session", "tools"}``) as MCPClient.
+    """
+
+    def __init__(self):
+        self._servers: dict[str, dict] = {}
+        self.exit_stack = AsyncExitStack()
+
+    async def connect_stdio_server(self, server_id: str, command: str, args: list[str], env: dict[str, str]):
+        read, write = await self.exit_stack.enter_async_context(
+            stdio_client(StdioServerParameters(command=command, args=args, env=env)))
+        session = await self.exit_stack.enter_async_context(ClientSession(read, write))
+        await session.initialize()
+        tools = (await session.list_tools()).tools
+        self._servers[server_id] = {"session": session, "tools": tools}
+        print(f"[Gateway] Connected to '{server_id}' with {len(tools)} tools")
+
+    async def cleanup(self):
+        await self.exit_stack.aclose()
+
+
+class GatewayServer:
+    """Serves `call_tool` / `list_tools` for upstream MCP sessions over a Unix socket.
+
+    Args:
+        client: anything with MCPClient's ``_servers`` mapping (an MCPClient or `UpstreamServers`)
+        socket_path: filesystem path of the Unix socket
+        cache_ttl: seconds a read-only tool response is reused (0 disables caching)
+        cache_max_entries: cached responses kept before the oldest are dropped
+    """
+
+    def __init__(self, client, socket_path: str = DEFAULT_SOCKET, cache_ttl: float = 60.0,
+                 cache_max_entries: int = 1024):
+        self.client = client
+        self.socket_path = socket_path
+        self.cache_ttl = cache_ttl
+        self._cache = TTLCache(cache_ttl, cache_max_entries)
+        self._inflight: dict[tuple, asyncio.Future] = {}
+        self._server: Optional[asyncio.AbstractServer] = None
+        self.stats = {"connections": 0, "calls": 0, "cacheHits": 0, "coalesced": 0, "upstreamCalls": 0, "errors": 0}
+
+    async def start(self):
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        self._server = await asyncio.start_unix_server(self._handle_connection, path=self.socket_path)
+        os.chmod(self.socket_path, 0o600)
+        print(f"[Gateway] Listening on {self.socket_path} (codec: {'msgpack' if msgpack else 'json'})")
+
+    async def serve_forever(self):
+        await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.stats["connections"] += 1
+        write_lock = asyncio.Lock()
+        tasks = set()
+
+        async def respond(request: dict):
+            try:
+                payload = {"id": request.get("id"), "ok": True, "result": await self._dispatch(request)}
+            except Exception as e:
+                self.stats["errors"] += 1
+                payload = {"id": request.get("id"), "ok": False, "error": f"{type(e).__name__}: {e}"}
+            async with write_lock:
+                writer.write(encode_frame(payload))
+                await writer.drain()
+
+        try:
+            while True:
+                request = await read_frame(reader)
+                if request is None:
+                    break
+                # Requests on one connection are multiplexed; answer them as they complete
+                task = asyncio.create_task(respond(request))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        except (ConnectionError, ValueError) as e:
+            print(f"[Gateway] Connection dropped: {e}")
+        finally:
+            for task in tasks:
+                task.cancel()
+            writer.close()
+
+    async def _dispatch(self, request: dict) -> Any:
+        op = request.get("op")
+        if op == "list_tools":
+            server = self.client._servers[request["server"]]
+            return ListToolsResult(tools=server["tools"]).model_dump(mode="json", by_alias=True, exclude_none=True)
+        if op == "call_tool":
+            return await self._call_tool(request["server"], request["tool"], request.get("args") or {})
+        if op == "stats":
+            return {**self.stats, "cacheEvictions": self._cache.evictions, "cachedEntries": len(self._cache)}
+        raise ValueError(f"Unknown gateway op '{op}'")
+
+    async def _call_tool(self, server_id: str, tool: str, args: dict) -> dict:
+        self.stats["calls"] += 1
+        cacheable = self.cache_ttl > 0 and is_cacheable(tool)
+        key = (server_id, tool, json.dumps(args, sort_keys=True, default=str))
+        if cacheable:
+            hit = self._cache.get(key)
+            if hit is not None:
+                self.stats["cacheHits"] += 1
+                return hit
+            pending = self._inflight.get(key)
+            if pending is not None:
+                self.stats["coalesced"] += 1
+                return await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().create_future()
+        if cacheable:
+            self._inflight[key] = future
+        try:
+            self.stats["upstreamCalls"] += 1
+            session = self.client._servers[server_id]["session"]
+            result = await session.call_tool(tool, args)
+            payload = result.model_dump(mode="json", by_alias=True, exclude_none=True)
+            if cacheable and not result.isError:
+                self._cache.put(key, payload)
+            future.set_result(payload)
+            return payload
+        except Exception as e:
+            future.set_exception(e)
+            # Mark the exception retrieved when nobody else was waiting on it
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+
+class GatewaySession:
+    """Drop-in for mcp.ClientSession's `call_tool` / `list_tools`, backed by a gateway socket."""
+
+    def __init__(self, server_id: str, socket_path: str = DEFAULT_SOCKET):
+        self.server_id = server_id
+        self.socket_path = socket_path
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._reader_task: Optional[asyncio.Task] = None
+        self._pending: dict[int, asyncio.Future] = {}
+        self._ids = itertools.count(1)
+        self._connect_lock = asyncio.Lock()
+
+    async def connect(self):
+        async with self._connect_lock:
+            if self._writer is not None and not self._writer.is_closing():
+                return
+            self._reader, self._writer = await asyncio.open_unix_connection(self.socket_path)
+            self._reader_task = asyncio.create_task(self._read_responses())
+
+    async def _read_responses(self):
+        error: Exception = ConnectionError("MCP gateway closed the connection")
+        try:
+            while True:
+                message = await read_frame(self._reader)
+                if message is None:
+                    break
+                future = self._pending.pop(message.get("id"), None)
+                if future is None or future.done():
+                    continue
+                if message.get("ok"):
+                    future.set_result(message.get("result"))
+                else:
+                    future.set_exception(RuntimeError(f"MCP gateway error: {message.get('error')}"))
+        except (ConnectionError, ValueError) as e:
+            error = e
+        finally:
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(error)
+            self._pending.clear()
+            if self._writer is not None:
+                self._writer.close()
+            self._writer = None
+
+    async def _request(self, op: str, **fields) -> Any:
+        await self.connect()
+        request_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        self._writer.write(encode_frame({"id": request_id, "op": op, "server": self.server_id, **fields}))
+        await self._writer.drain()
+        return await future
+
+    async def list_tools(self) -> ListToolsResult:
+        return ListToolsResult.model_validate(await self._request("list_tools"))
+
+    async def call_tool(self, name: str, arguments: Optional[dict] = None) -> CallToolResult:
+        return CallToolResult.model_validate(await self._request("call_tool", tool=name, args=arguments or {}))
+
+    async def stats(self) -> dict:
+        return await self._request("stats")
+
+    async def close(self):
+        if self._reader_task is not None:
+            self._reader_task.cancel()
+            try:
+                await self._reader_task
+            except asyncio.CancelledError:
+                pass
+            self._reader_task = None
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+
+async def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run the shared Azure DevOps MCP gateway")
+    parser.add_argument("--socket", default=os.environ.get("MCP_GATEWAY_SOCKET", DEFAULT_SOCKET), help="Unix socket path to listen on.")
+    parser.add_argument("--cache-ttl", type=float, default=float(os.environ.get("MCP_GATEWAY_CACHE_TTL", "60")), help="Seconds to reuse read-only tool responses (0 disables).")
+    parser.add_argument("--cache-max", type=int, default=int(os.environ.get("MCP_GATEWAY_CACHE_MAX_ENTRIES", "1024")), help="Cached tool responses kept at most.")
+    args = parser.parse_args()
+
+    # Only the MCP sessions are needed here; MCPClient would also require model credentials
+    client = UpstreamServers()
+    gateway = GatewayServer(client, args.socket, cache_ttl=args.cache_ttl, cache_max_entries=args.cache_max)
+    try:
+        await client.connect_stdio_server(
+            "azure devops",
+            "npx",
+            ["-y", "@azure-devops/mcp", "DevOpsAssistant"],
+            {}
+        )
+        await gateway.serve_forever()
+    finally:
+        await gateway.close()
+        await client.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
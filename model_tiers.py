@@ -0,0 +1,111 @@
+"""Model tiers for chatWithTools: a small, fast deployment first, the large one when needed.
+
+Most questions that reach the model loop are simple lookups ("list active PRs"), with
+one round of tool calls and a short answer. With a small tier configured, chatWithTools
+starts on it. The small model picks the tools and answers. The conversation escalates to
+the large tier, and stays there, when:
+
+- the prompt looks complex before the first call (`complexity_reasons`)
+- the small model answers with the `ESCALATE` marker (its own assessment)
+- the small model asks for a second round of tool calls
+- the small model produces tool arguments that are not valid JSON
+
+A tier's `client` is anything with the ChatCompletionsClient `complete(messages=, model=,
+tools=)` signature. That lets local stand-in endpoints or in-process fakes replace Azure.
+"""
+import os
+import re
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from azure.ai.inference.models import SystemMessage, UserMessage
+
+SMALL = "small"
+LARGE = "large"
+ESCALATE = "ESCALATE"
+
+# Appended to the conversation's system message on the small tier, so it refines rather than contradicts it
+SMALL_TIER_PROMPT = (
+    "You are the fast first responder for these questions. "
+    "Call the one or two tools that answer the question directly, then answer from their results "
+    "in the response structure above, keeping each section brief. "
+    "If the request needs several rounds of tool calls, comparisons across data, planning, "
+    f"write actions, or you are not confident, reply with only the word {ESCALATE} instead of that structure."
+)
+_ESCALATE_PATTERN = re.compile(rf"\b{ESCALATE}\b")
+
+# Prompts longer than this (characters of user text) go straight to the large tier
+MAX_SIMPLE_PROMPT_CHARS = 400
+
+# Words that signal reasoning, multi-step work or writes
+_COMPLEX_PATTERN = re.compile(
+    r"\b(why|compare|comparison|trend|forecast|predict|recommend\w*|plan\w*|analy[sz]\w*|root cause|"
+    r"explain|summari[sz]e|risk\w*|and then|create|update|delete|assign|move|close)\b"
+)
+
+
+@dataclass
+class ModelTier:
+    """One model deployment and what it costs (per 1,000 tokens)."""
+    name: str
+    model: str
+    client: Any
+    prompt_cost_per_1k: float = 0.0
+    completion_cost_per_1k: float = 0.0
+
+    def cost(self, prompt_tokens: int, completion_tokens: int) -> float:
+        return (prompt_tokens * self.prompt_cost_per_1k + completion_tokens * self.completion_cost_per_1k) / 1000
+
+
+def _user_text(messages: list) -> list[str]:
+    texts = []
+    for message in messages:
+        if not isinstance(message, UserMessage):
+            continue
+        content = message.content
+        if isinstance(content, list):
+            content = " ".join(getattr(item, "text", "") or "" for item in content)
+        texts.append(str(content))
+    return texts
+
+
+def complexity_reasons(messages: list) -> list[str]:
+    """Why a conversation should skip the small tier (empty list = looks simple)."""
+    texts = _user_text(messages)
+    text = " ".join(texts).lower()
+    reasons = []
+    if len(texts) > 1:
+        reasons.append("multiple user messages")
+    if len(text) > MAX_SIMPLE_PROMPT_CHARS:
+        reasons.append(f"prompt longer than {MAX_SIMPLE_PROMPT_CHARS} characters")
+    if text.count("?") > 1:
+        reasons.append("multiple questions")
+    words = sorted({m.group(1) for m in _COMPLEX_PATTERN.finditer(text)})
+    if words:
+        reasons.append("keywords: " + ", ".join(words))
+    return reasons
+
+
+def self_escalated(text: Optional[str]) -> bool:
+    """Whether a small-tier reply contains the marker anywhere (models sometimes wrap it in the format).
+
+    Case-sensitive, so prose such as "no need to escalate" is not mistaken for the marker.
+    """
+    return bool(text) and _ESCALATE_PATTERN.search(text) is not None
+
+
+def with_small_tier_prompt(messages: list) -> list:
+    """`messages` with SMALL_TIER_PROMPT merged into the leading system message (or one added)."""
+    if messages and isinstance(messages[0], SystemMessage):
+        return [SystemMessage(content=f"{messages[0].content}\n\n{SMALL_TIER_PROMPT}"), *messages[1:]]
+    return [SystemMessage(content=SMALL_TIER_PROMPT), *messages]
+
+
+def tier_costs_from_env(name: str, prompt_default: float, completion_default: float) -> tuple[float, float]:
+    """Per-1k-token prices from AZURE_AI_<NAME>_PROMPT_COST / AZURE_AI_<NAME>_COMPLETION_COST."""
+    def read(suffix, default):
+        try:
+            return float(os.environ.get(f"AZURE_AI_{name.upper()}_{suffix}", default))
+        except ValueError:
+            return default
+    return read("PROMPT_COST", prompt_default), read("COMPLETION_COST", completion_default)
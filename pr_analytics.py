@@ -0,0 +1,318 @@
+"""Streaming, incrementally cached pull-request analytics.
+
+PR pages are folded into invertible aggregates (counts, sums, histogram buckets) as they
+arrive and then dropped. For each PR only a small contribution tuple and a revision key
+are retained, so a refresh can subtract a changed PR's old contribution and add the new
+one. Unchanged PRs are skipped, and paging of completed/abandoned PRs stops at the first
+page with no new or changed PRs.
+
+Comment counts are not part of the list payload. They are fetched from the PR's threads,
+only for new or changed PRs, so a steady-state refresh makes no extra calls. A count is
+refreshed when the PR's revision changes (status, votes, commits), not on every new
+comment. The MCP tools expose no diff stats, so PR size is not reported.
+"""
+import asyncio
+import math
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from typing import NamedTuple, Optional
+
+from workitem_frame import parse_epoch
+
+LIST_TOOL = "repo_list_pull_requests_by_repo_or_project"
+GET_TOOL = "repo_get_pull_request_by_id"
+REPOS_TOOL = "repo_list_repos_by_project"
+THREADS_TOOL = "repo_list_pull_request_threads"
+
+# Upper bounds (hours) of the time-to-merge histogram buckets; the last bucket is open
+MERGE_BUCKETS = (0.5, 1, 2, 4, 8, 12, 24, 48, 72, 120, 168, 336, 720, math.inf)
+
+
+class PRContribution(NamedTuple):
+    """What a single PR adds to the aggregates; retained so it can be subtracted later."""
+    status: str
+    author: str
+    reviewers: tuple
+    outcome: str
+    merge_hours: Optional[float]
+    comments: Optional[int]
+    created_day: str
+
+
+# Some MCP server versions return the PullRequestStatus enum value instead of its name
+_STATUS_NAMES = {1: "active", 2: "abandoned", 3: "completed"}
+
+
+def pr_status(pr: dict) -> str:
+    status = pr.get("status")
+    if isinstance(status, int):
+        return _STATUS_NAMES.get(status, "")
+    return str(status or "").lower()
+
+
+def pr_key(pr: dict, repo_id: Optional[str] = None) -> str:
+    repo = repo_id or (pr.get("repository") or {}).get("id") or ""
+    return f"{repo}:{pr.get('pullRequestId', pr.get('id', ''))}"
+
+
+def pr_revision(pr: dict) -> tuple:
+    """Cheap stand-in for a last-updated timestamp: changes whenever the PR does."""
+    last_commit = (pr.get("lastMergeSourceCommit") or {}).get("commitId")
+    votes = tuple(sorted((r.get("uniqueName") or r.get("displayName") or "", r.get("vote", 0)) for r in pr.get("reviewers") or []))
+    return (pr_status(pr), pr.get("closedDate"), last_commit, votes, pr.get("isDraft"))
+
+
+def count_comments(threads) -> int:
+    """Human comments across a PR's threads (system messages such as vote or push notices excluded)."""
+    if isinstance(threads, dict):
+        threads = threads.get("value") or []
+    total = 0
+    for thread in threads or []:
+        if not isinstance(thread, dict) or thread.get("isDeleted"):
+            continue
+        for comment in thread.get("comments") or []:
+            if isinstance(comment, dict) and not comment.get("isDeleted") and comment.get("commentType", "text") == "text":
+                total += 1
+    return total
+
+
+def contribution(pr: dict) -> PRContribution:
+    status = pr_status(pr)
+    reviewers = tuple(r.get("displayName") or r.get("uniqueName") or "Unknown" for r in pr.get("reviewers") or [] if not r.get("isContainer"))
+    votes = [r.get("vote", 0) for r in pr.get("reviewers") or []]
+    if status == "completed" or any(v >= 10 for v in votes):
+        outcome = "approved"
+    elif any(v < 0 for v in votes) or pr.get("isDraft"):
+        outcome = "blocked"
+    elif status == "active":
+        outcome = "inReview"
+    else:
+        outcome = "other"
+
+    created = parse_epoch(pr.get("creationDate"))
+    closed = parse_epoch(pr.get("closedDate"))
+    merge_hours = None
+    if status == "completed" and not (math.isnan(created) or math.isnan(closed)):
+        merge_hours = max(closed - created, 0.0) / 3600
+    created_day = "" if math.isnan(created) else datetime.fromtimestamp(created, timezone.utc).strftime("%Y-%m-%d")
+    comments = pr.get("commentCount")
+    return PRContribution(
+        status=status,
+        author=(pr.get("createdBy") or {}).get("displayName") or "Unknown",
+        reviewers=reviewers,
+        outcome=outcome,
+        merge_hours=merge_hours,
+        comments=comments if isinstance(comments, int) else None,
+        created_day=created_day,
+    )
+
+
+class PRAggregates:
+    """Invertible running aggregates over PR contributions."""
+
+    def __init__(self):
+        self.total = 0
+        self.outcomes = Counter()
+        self.statuses = Counter()
+        self.merge_hist = [0] * len(MERGE_BUCKETS)
+        self.merge_sum = 0.0
+        self.merge_count = 0
+        self.reviewer_load = Counter()
+        self.author_prs = Counter()
+        self.author_comments = Counter()
+        # PRs per author whose comment count is known
+        self.author_counted = Counter()
+        # day -> [created count, merge-hours sum, merged count]
+        self.daily: dict[str, list] = {}
+
+    def apply(self, c: PRContribution, sign: int = 1):
+        self.total += sign
+        self.outcomes[c.outcome] += sign
+        self.statuses[c.status] += sign
+        self.author_prs[c.author] += sign
+        if c.comments is not None:
+            self.author_comments[c.author] += sign * c.comments
+            self.author_counted[c.author] += sign
+        for reviewer in c.reviewers:
+            self.reviewer_load[reviewer] += sign
+        if c.merge_hours is not None:
+            for i, bound in enumerate(MERGE_BUCKETS):
+                if c.merge_hours <= bound:
+                    self.merge_hist[i] += sign
+                    break
+            self.merge_sum += sign * c.merge_hours
+            self.merge_count += sign
+        if c.created_day:
+            day = self.daily.setdefault(c.created_day, [0, 0.0, 0])
+            day[0] += sign
+            if c.merge_hours is not None:
+                day[1] += sign * c.merge_hours
+                day[2] += sign
+
+    def merge_percentile(self, pct: float) -> float:
+        """Histogram estimate, interpolating linearly inside the bucket that crosses `pct`."""
+        if self.merge_count <= 0:
+            return 0.0
+        target = self.merge_count * pct / 100.0
+        cumulative = 0
+        lower = 0.0
+        for count, upper in zip(self.merge_hist, MERGE_BUCKETS):
+            if count and cumulative + count >= target:
+                if math.isinf(upper):
+                    return lower
+                return lower + (upper - lower) * (target - cumulative) / count
+            cumulative += count
+            lower = upper
+        return lower
+
+    def summary(self, trend_days: int = 14) -> dict:
+        """Shape matches the frontend's PRAnalytics type, plus the extra distributions."""
+        days = sorted(d for d, v in self.daily.items() if v[0] > 0)[-trend_days:]
+        return {
+            "totalPRs": self.total,
+            "avgReviewTime": round(self.merge_sum / self.merge_count, 1) if self.merge_count else 0,
+            "approvalRate": round(100 * self.outcomes["approved"] / self.total, 1) if self.total else 0,
+            "statusCounts": {
+                "approved": self.outcomes["approved"],
+                "inReview": self.outcomes["inReview"],
+                "blocked": self.outcomes["blocked"],
+            },
+            "trends": [
+                {
+                    "date": d,
+                    "count": self.daily[d][0],
+                    "reviewTime": round(self.daily[d][1] / self.daily[d][2], 1) if self.daily[d][2] else 0,
+                }
+                for d in days
+            ],
+            "developerPatterns": [
+                {
+                    "name": name,
+                    "prs": prs,
+                    # None when no comment counts were fetched (threads tool unavailable)
+                    "avgComments": round(self.author_comments[name] / self.author_counted[name], 1)
+                    if self.author_counted[name] > 0 else None,
+                }
+                for name, prs in self.author_prs.most_common(10) if prs > 0
+            ],
+            "timeToMerge": {f"p{p}": round(self.merge_percentile(p), 1) for p in (50, 75, 90, 95)},
+            "reviewerLoad": [{"name": n, "reviews": c} for n, c in self.reviewer_load.most_common(10) if c > 0],
+        }
+
+
+class PRAnalyticsCache:
+    """Per-project PR aggregates refreshed incrementally from the MCP repo tools."""
+
+    def __init__(self, project: str, page_size: int = 100, concurrency: int = 4, min_refresh_seconds: float = 60.0):
+        self.project = project
+        self.page_size = page_size
+        self.concurrency = concurrency
+        self.min_refresh_seconds = min_refresh_seconds
+        self.aggregates = PRAggregates()
+        self._prs: dict[str, tuple] = {}  # key -> (revision, PRContribution)
+        self._lock = asyncio.Lock()
+        self.last_refresh = 0.0
+        self.last_stats: dict = {}
+
+    def is_current(self, pr: dict, repo_id: Optional[str] = None) -> bool:
+        cached = self._prs.get(pr_key(pr, repo_id))
+        return cached is not None and cached[0] == pr_revision(pr)
+
+    def upsert(self, pr: dict, repo_id: Optional[str] = None) -> bool:
+        """Fold one PR into the aggregates. Returns False when it was already up to date."""
+        if not isinstance(pr, dict):
+            return False
+        key = pr_key(pr, repo_id)
+        revision = pr_revision(pr)
+        cached = self._prs.get(key)
+        if cached is not None:
+            if cached[0] == revision:
+                return False
+            self.aggregates.apply(cached[1], -1)
+        c = contribution(pr)
+        self.aggregates.apply(c, 1)
+        self._prs[key] = (revision, c)
+        return True
+
+    async def refresh(self, session, extract_json, force: bool = False, comment_counts: bool = True) -> dict:
+        """Page through PRs across repositories and fold new/changed ones into the aggregates.
+
+        Args:
+            session: MCP ClientSession (or anything with an async ``call_tool``)
+            extract_json: callable turning a tool result's ``content`` into JSON
+            force: ignore ``min_refresh_seconds``
+            comment_counts: fetch each new/changed PR's threads (``THREADS_TOOL``) to count comments
+        """
+        async with self._lock:
+            if not force and time.monotonic() - self.last_refresh < self.min_refresh_seconds:
+                return self.last_stats
+            started = time.perf_counter()
+            semaphore = asyncio.Semaphore(self.concurrency)
+            stats = {"pages": 0, "seen": 0, "changed": 0, "threadCalls": 0}
+            seen_active = set()
+
+            async def call(tool, args):
+                async with semaphore:
+                    resp = await session.call_tool(tool, args)
+                return extract_json(resp.content)
+
+            async def with_comment_count(pr, repo_id):
+                """`pr`, plus a commentCount from its threads when it is new or changed."""
+                repo = repo_id or (pr.get("repository") or {}).get("id")
+                pr_id = pr.get("pullRequestId")
+                if not comment_counts or not repo or pr_id is None or self.is_current(pr, repo_id):
+                    return pr
+                stats["threadCalls"] += 1
+                try:
+                    threads = await call(THREADS_TOOL, {"repositoryId": repo, "pullRequestId": pr_id, "project": self.project})
+                except Exception as e:
+                    print(f"[DEBUG] Could not count comments on PR {pr_id}: {e}")
+                    return pr
+                return {**pr, "commentCount": count_comments(threads)} if threads is not None else pr
+
+            repos = await call(REPOS_TOOL, {"project": self.project})
+            repo_ids = [r.get("id") for r in repos or [] if isinstance(r, dict) and r.get("id")] or [None]
+
+            async def scan(repo_id, status):
+                skip = 0
+                while True:
+                    args = {"project": self.project, "status": status, "top": self.page_size, "skip": skip}
+                    if repo_id:
+                        args["repositoryId"] = repo_id
+                    page = await call(LIST_TOOL, args)
+                    page = page if isinstance(page, list) else (page or {}).get("value") or []
+                    stats["pages"] += 1
+                    page = await asyncio.gather(*(with_comment_count(pr, repo_id) for pr in page if isinstance(pr, dict)))
+                    changed = 0
+                    for pr in page:
+                        stats["seen"] += 1
+                        if self.upsert(pr, repo_id):
+                            changed += 1
+                        if status == "Active" and isinstance(pr, dict):
+                            seen_active.add(pr_key(pr, repo_id))
+                    stats["changed"] += changed
+                    # Closed PRs are immutable and listed newest first: an unchanged page means the rest is cached
+                    if len(page) < self.page_size or (status != "Active" and changed == 0):
+                        return
+                    skip += self.page_size
+
+            await asyncio.gather(*(scan(repo_id, status) for repo_id in repo_ids for status in ("Active", "Completed", "Abandoned")))
+
+            # PRs we cached as active that are no longer listed as active closed somewhere past the early stop
+            stale = [key for key, (_, c) in self._prs.items() if c.status == "active" and key not in seen_active]
+
+            async def reload(key):
+                repo_id, _, pr_id = key.rpartition(":")
+                pr = await call(GET_TOOL, {"repositoryId": repo_id, "pullRequestId": int(pr_id), "project": self.project})
+                if isinstance(pr, dict) and self.upsert(await with_comment_count(pr, repo_id), repo_id):
+                    stats["changed"] += 1
+
+            await asyncio.gather(*(reload(key) for key in stale if key.split(":", 1)[0] and key.rsplit(":", 1)[1].isdigit()))
+
+            stats["stale"] = len(stale)
+            stats["cachedPRs"] = len(self._prs)
+            stats["seconds"] = round(time.perf_counter() - started, 3)
+            self.last_refresh = time.monotonic()
+            self.last_stats = stats
+            return stats
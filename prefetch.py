@@ -0,0 +1,159 @@
+"""Speculative background prefetch of likely-next API views.
+
+Frontend navigation is predictable. The Sprints page loads `/api/sprints` and then the
+current sprint's insights. The dashboard is usually followed by the sprint and
+code-review views. After serving one view, the API `schedule`s the next ones. Their
+results are parked here for ``ttl`` seconds, and the route handler that would have
+computed them takes the result with `get` instead.
+
+Prefetches are low priority. Each waits until no foreground request is in flight (up to
+``max_defer`` seconds) and at most ``concurrency`` run at once. A request is only joined
+to a prefetch that is already running. One still waiting for a slot is cancelled, and the
+request computes the view itself rather than queueing behind slower prefetches. Parked
+results are single-use, so a reload always recomputes. Results that expire unused count
+as waste.
+"""
+import asyncio
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Hashable, Optional
+
+
+class _Entry:
+    __slots__ = ("value", "expires")
+
+    def __init__(self, value: Any, expires: float):
+        self.value = value
+        self.expires = expires
+
+
+class Prefetcher:
+    """Runs speculative fetches in the background and hands their results to the next request.
+
+    Args:
+        concurrency: maximum prefetches running at once
+        ttl: seconds a prefetched result stays usable
+        max_entries: parked results kept before the oldest is dropped (counted as waste)
+        max_defer: longest a prefetch waits for foreground requests to finish
+        enabled: when False, `schedule` is a no-op and `get` always computes
+    """
+
+    def __init__(self, concurrency: int = 2, ttl: float = 60.0, max_entries: int = 32,
+                 max_defer: float = 5.0, enabled: bool = True):
+        self.concurrency = concurrency
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_defer = max_defer
+        self.enabled = enabled
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._running: dict[Hashable, asyncio.Task] = {}
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._foreground = 0
+        # Prefetches waiting for foreground traffic to drain, released early if a request joins them
+        self._deferred: dict[Hashable, asyncio.Event] = {}
+        # Prefetches holding a semaphore slot, i.e. actually fetching
+        self._started: set[Hashable] = set()
+        self.stats = {"scheduled": 0, "skipped": 0, "completed": 0, "failed": 0,
+                      "hits": 0, "joined": 0, "preempted": 0, "misses": 0, "wasted": 0}
+
+    @contextmanager
+    def foreground(self):
+        """Mark a user-facing request as in flight; prefetches hold off until none are."""
+        self._foreground += 1
+        try:
+            yield
+        finally:
+            self._foreground -= 1
+            if self._foreground == 0:
+                for ready in self._deferred.values():
+                    ready.set()
+
+    def schedule(self, key: Hashable, factory: Callable[[], Awaitable[Any]]):
+        """Start fetching `key` in the background unless it is parked or already running."""
+        if not self.enabled:
+            return
+        self.evict_expired()
+        if key in self._entries or key in self._running:
+            self.stats["skipped"] += 1
+            return
+        self.stats["scheduled"] += 1
+        task = asyncio.create_task(self._run(key, factory))
+        self._running[key] = task
+        task.add_done_callback(lambda done: self._running.pop(key) if self._running.get(key) is done else None)
+
+    async def get(self, key: Hashable, compute: Callable[[], Awaitable[Any]]) -> Any:
+        """The prefetched result for `key` if one is parked or in flight, else `compute()`."""
+        self.evict_expired()
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.stats["hits"] += 1
+            return entry.value
+        task = self._running.get(key)
+        if task is not None and key not in self._started:
+            # Not fetching yet (deferred or queued for a slot): computing now is never slower
+            task.cancel()
+            self._running.pop(key, None)
+            self.stats["preempted"] += 1
+        elif task is not None:
+            await asyncio.shield(task)
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self.stats["joined"] += 1
+                return entry.value
+        self.stats["misses"] += 1
+        return await compute()
+
+    def evict_expired(self):
+        now = time.monotonic()
+        expired = [key for key, entry in self._entries.items() if entry.expires <= now]
+        for key in expired:
+            del self._entries[key]
+        self.stats["wasted"] += len(expired)
+
+    def summary(self) -> dict:
+        self.evict_expired()
+        used = self.stats["hits"] + self.stats["joined"]
+        completed = self.stats["completed"]
+        return {
+            **self.stats,
+            "parked": len(self._entries),
+            "running": len(self._running),
+            "hitRate": round(used / completed, 3) if completed else None,
+            "wasteRate": round(self.stats["wasted"] / completed, 3) if completed else None,
+        }
+
+    async def _run(self, key: Hashable, factory: Callable[[], Awaitable[Any]]):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        if self._foreground:
+            ready = self._deferred[key] = asyncio.Event()
+            try:
+                await asyncio.wait_for(ready.wait(), timeout=self.max_defer)
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                self._deferred.pop(key, None)
+        async with self._semaphore:
+            self._started.add(key)
+            try:
+                value = await factory()
+            except Exception as e:
+                # Nothing awaits a failed prefetch; the next request simply computes the view itself
+                self.stats["failed"] += 1
+                print(f"[DEBUG] Prefetch {key} failed: {e}")
+                return
+            finally:
+                self._started.discard(key)
+        self.stats["completed"] += 1
+        self._entries[key] = _Entry(value, time.monotonic() + self.ttl)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats["wasted"] += 1
+
+    async def close(self):
+        for task in list(self._running.values()):
+            task.cancel()
+        await asyncio.gather(*self._running.values(), return_exceptions=True)
+        self._running.clear()
+        self._entries.clear()
@@ -0,0 +1,224 @@
+"""Compact MCP tool results before they are sent back to the model.
+
+Azure DevOps responses carry `_links`, URLs, avatars and identity descriptors that the
+model never needs, and `str(result.content)` wraps all of it in a TextContent repr.
+`compact_tool_result` parses the JSON and applies a per-tool field projection when one
+is known. It strips link/metadata noise, collapses identity objects to display names,
+and encodes homogeneous lists as a tab-separated table. The output is capped at
+`max_chars` with an explicit truncation note.
+"""
+import json
+from typing import Any, Optional
+
+# Keys dropped everywhere (compared case-insensitively)
+NOISE_KEYS = frozenset({
+    "_links", "links", "url", "href", "avatar", "imageurl", "descriptor", "subjectdescriptor",
+    "remoteurl", "weburl", "sshurl", "artifactid", "supportsiterations", "codereviewid",
+    "mergeid", "lastmergetargetcommit", "lastmergecommit", "completionqueuetime",
+})
+
+_WORK_ITEM_FIELDS = [
+    "id",
+    "fields.System.WorkItemType",
+    "fields.System.Title",
+    "fields.System.State",
+    "fields.System.AssignedTo",
+    "fields.System.IterationPath",
+    "fields.System.CreatedDate",
+    "fields.System.ChangedDate",
+    "fields.Microsoft.VSTS.Common.ClosedDate",
+    "fields.Microsoft.VSTS.Common.Priority",
+    "fields.Microsoft.VSTS.Scheduling.Effort",
+    "fields.Microsoft.VSTS.Scheduling.StoryPoints",
+    "fields.Microsoft.VSTS.Scheduling.RemainingWork",
+]
+
+_PULL_REQUEST_FIELDS = [
+    "pullRequestId",
+    "title",
+    "status",
+    "isDraft",
+    "createdBy",
+    "creationDate",
+    "closedDate",
+    "sourceRefName",
+    "targetRefName",
+    "repository.name",
+    "reviewers",
+    "mergeStatus",
+]
+
+# Per-tool projections applied to each item of the (normalized) result list
+TOOL_PROJECTIONS = {
+    "wit_get_work_items_batch_by_ids": _WORK_ITEM_FIELDS,
+    "wit_get_work_item": _WORK_ITEM_FIELDS,
+    "wit_my_work_items": _WORK_ITEM_FIELDS,
+    "repo_list_pull_requests_by_repo_or_project": _PULL_REQUEST_FIELDS,
+    "repo_get_pull_request_by_id": _PULL_REQUEST_FIELDS,
+    "repo_list_repos_by_project": ["id", "name", "defaultBranch", "size"],
+    "core_list_project_teams": ["id", "name", "description"],
+    "core_list_projects": ["id", "name", "state", "lastUpdateTime"],
+    "work_list_team_iterations": ["id", "name", "path", "attributes.startDate", "attributes.finishDate", "attributes.timeFrame"],
+    "work_list_iterations": ["id", "identifier", "name", "path", "attributes.startDate", "attributes.finishDate", "attributes.timeFrame"],
+}
+
+# Tools returning a node tree ("children"); flattened to one row per node before projection
+TREE_TOOLS = frozenset({"work_list_iterations"})
+
+
+def content_text(content) -> str:
+    """Concatenate the text parts of an MCP result's content list."""
+    if isinstance(content, str):
+        return content
+    parts = []
+    for item in content or []:
+        text = getattr(item, "text", None)
+        parts.append(text if text is not None else str(item))
+    return "\n".join(parts)
+
+
+def _strip(value: Any) -> Any:
+    """Drop noise keys and collapse identity objects ({displayName, uniqueName, id, ...})."""
+    if isinstance(value, dict):
+        if "displayName" in value and ("uniqueName" in value or "descriptor" in value or "imageUrl" in value):
+            vote = value.get("vote")
+            return f"{value['displayName']} (vote {vote})" if vote is not None else value["displayName"]
+        out = {}
+        for key, val in value.items():
+            if key.lower() in NOISE_KEYS or val is None or val == "" or val == [] or val == {}:
+                continue
+            out[key] = _strip(val)
+        return out
+    if isinstance(value, list):
+        return [_strip(v) for v in value]
+    return value
+
+
+def _get_path(item: dict, path: str):
+    """Resolve a dotted path; Azure field names contain dots, so try the longest key first."""
+    if path in item:
+        return item[path]
+    head, _, rest = path.partition(".")
+    if not rest:
+        return None
+    child = item.get(head)
+    if isinstance(child, dict):
+        return _get_path(child, rest)
+    return None
+
+
+def _project(item: Any, paths: list[str]) -> Any:
+    if not isinstance(item, dict):
+        return item
+    out = {}
+    for path in paths:
+        val = _get_path(item, path)
+        if val is not None:
+            # Work-item columns keep only the last name segment (Title, State, ClosedDate, ...)
+            name = path.split(".")[-1] if path.startswith("fields.") else path
+            out[name] = val
+    return out
+
+
+def _flatten(item: dict, prefix: str = "") -> dict:
+    flat = {}
+    for key, val in item.items():
+        name = f"{prefix}{key}"
+        if isinstance(val, dict) and val:
+            flat.update(_flatten(val, f"{name}."))
+        else:
+            flat[name] = val
+    return flat
+
+
+def _cell(value: Any) -> str:
+    if isinstance(value, (list, dict)):
+        value = json.dumps(value, separators=(",", ":"), ensure_ascii=False)
+    return str(value).replace("\t", " ").replace("\n", " ")
+
+
+def _as_table(rows: list[dict]) -> Optional[list[str]]:
+    """Tab-separated lines (header first) when rows are dicts sharing most of their keys."""
+    if len(rows) < 2 or not all(isinstance(r, dict) for r in rows):
+        return None
+    flat_rows = [_flatten(r) for r in rows]
+    columns: dict[str, int] = {}
+    for r in flat_rows:
+        for key in r:
+            columns[key] = columns.get(key, 0) + 1
+    # Heterogeneous lists (few shared columns) read better as JSON
+    shared = sum(1 for count in columns.values() if count == len(rows))
+    if shared * 2 < len(columns):
+        return None
+    header = list(columns)
+    lines = ["\t".join(header)]
+    for r in flat_rows:
+        lines.append("\t".join(_cell(r.get(col, "")) for col in header))
+    return lines
+
+
+def _flatten_tree(nodes: Any) -> list:
+    flat = []
+    stack = list(reversed(nodes if isinstance(nodes, list) else [nodes]))
+    while stack:
+        node = stack.pop()
+        if not isinstance(node, dict):
+            continue
+        flat.append(node)
+        stack.extend(reversed(node.get("children") or []))
+    return flat
+
+
+def _normalize(data: Any) -> Any:
+    """Unwrap Azure list envelopes ({"count": n, "value": [...]})."""
+    if isinstance(data, dict):
+        for key in ("value", "workItems", "items"):
+            if isinstance(data.get(key), list) and len(data) <= 2:
+                return data[key]
+    return data
+
+
+def compact_tool_result(tool_name: str, content, max_chars: int = 12000) -> str:
+    """Model-facing text for a tool result.
+
+    Args:
+        tool_name: MCP tool that produced the result (selects the field projection)
+        content: `result.content` from `call_tool`, or raw text
+        max_chars: output size cap; excess rows/characters are cut with a note
+    """
+    text = content_text(content)
+    try:
+        data = json.loads(text)
+    except (TypeError, ValueError):
+        if len(text) <= max_chars:
+            return text
+        return text[:max_chars] + f"\n[truncated: {len(text) - max_chars} of {len(text)} characters omitted]"
+
+    data = _normalize(data)
+    if tool_name in TREE_TOOLS:
+        data = _flatten_tree(data)
+    paths = TOOL_PROJECTIONS.get(tool_name)
+    if paths and isinstance(data, list):
+        data = [_project(item, paths) for item in data]
+    elif paths and isinstance(data, dict):
+        data = _project(data, paths)
+    data = _strip(data)
+
+    if isinstance(data, list):
+        lines = _as_table(data)
+        if lines is not None:
+            header, rows = lines[0], lines[1:]
+            out = [f"{len(rows)} rows (tab-separated)", header]
+            size = sum(len(line) + 1 for line in out)
+            for i, row in enumerate(rows):
+                if size + len(row) + 1 > max_chars:
+                    out.append(f"[truncated: showing {i} of {len(rows)} rows]")
+                    break
+                out.append(row)
+                size += len(row) + 1
+            return "\n".join(out)
+
+    compact = json.dumps(data, separators=(",", ":"), ensure_ascii=False)
+    if len(compact) <= max_chars:
+        return compact
+    return compact[:max_chars] + f"\n[truncated: {len(compact) - max_chars} of {len(compact)} characters omitted]"
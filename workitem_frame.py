@@ -0,0 +1,242 @@
+"""Columnar view over Azure DevOps work items.
+
+`WorkItemFrame` is built once from `normalize_work_items` output and keeps only the
+columns the dashboard and sprint analytics read, as typed arrays:
+
+- ids (int64), effort (float64)
+- created / closed timestamps as epoch seconds (float64, NaN when missing). Only cycle
+  times read `created`, so it is parsed for closed rows only.
+- state and assignee as small-int codes into interned category tables
+"""
+import math
+import sys
+from array import array
+from collections import Counter
+from datetime import date, datetime, timezone
+from typing import Iterable, Optional
+
+COMPLETED_STATES = frozenset({"closed", "done", "resolved"})
+EFFORT_FIELDS = ("Microsoft.VSTS.Scheduling.Effort", "Microsoft.VSTS.Scheduling.StoryPoints")
+UNASSIGNED = "Unassigned"
+NAN = float("nan")
+
+
+def parse_dt(value: Optional[str]) -> Optional[datetime]:
+    """Parse an Azure DevOps ISO timestamp ('...Z' suffix allowed); None if unparseable."""
+    if not value or not isinstance(value, str):
+        return None
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+
+
+def parse_epoch(value: Optional[str]) -> float:
+    """Epoch seconds for an ISO timestamp, NaN when missing or unparseable."""
+    if not value or not isinstance(value, str):
+        return NAN
+    try:
+        dt = datetime.fromisoformat(value)
+    except ValueError:
+        # fromisoformat only accepts the 'Z' suffix from Python 3.11
+        dt = parse_dt(value)
+        if dt is None:
+            return NAN
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+def format_epoch(ts: float) -> str:
+    """Inverse of `parse_epoch` for display: UTC ISO string with millisecond precision."""
+    if math.isnan(ts):
+        return ""
+    return datetime.fromtimestamp(ts, timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z"
+
+
+def _assignee_name(val) -> str:
+    if isinstance(val, dict):
+        return val.get("displayName") or val.get("uniqueName") or UNASSIGNED
+    if isinstance(val, str) and val:
+        return val
+    return UNASSIGNED
+
+
+def _effort(fields: dict) -> float:
+    for key in EFFORT_FIELDS:
+        val = fields.get(key)
+        if isinstance(val, (int, float)):
+            return float(val)
+    return 1.0
+
+
+def _percentile(sorted_values: list, pct: float) -> float:
+    """Linear-interpolated percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * (pct / 100.0)
+    lo = math.floor(k)
+    hi = math.ceil(k)
+    if lo == hi:
+        return sorted_values[int(k)]
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+class WorkItemFrame:
+    """Array-backed table of work items with filters and group-bys over its columns."""
+
+    __slots__ = ("ids", "effort", "created", "closed",
+                 "state_codes", "assignee_codes", "states", "assignees",
+                 "_state_index", "_assignee_index")
+
+    def __init__(self, states: list[str], assignees: list[str]):
+        self.ids = array("q")
+        self.effort = array("d")
+        self.created = array("d")
+        self.closed = array("d")
+        self.state_codes = array("I")
+        self.assignee_codes = array("I")
+        # Category tables shared (not copied) between a frame and its filtered views
+        self.states = states
+        self.assignees = assignees
+        self._state_index = {s: i for i, s in enumerate(states)}
+        self._assignee_index = {a: i for i, a in enumerate(assignees)}
+
+    @classmethod
+    def from_items(cls, items: Iterable) -> "WorkItemFrame":
+        """Build a frame from work-item dicts (`{"id": ..., "fields": {...}}`)."""
+        frame = cls([], [])
+        frame.extend(items)
+        return frame
+
+    def extend(self, items: Iterable):
+        """Append work-item dicts, e.g. one fetched batch at a time, without keeping them."""
+        # Hot loop over every fetched row: bind column appends and lookups to locals
+        ids, effort, created, closed = self.ids.append, self.effort.append, self.created.append, self.closed.append
+        state_codes, assignee_codes = self.state_codes.append, self.assignee_codes.append
+        state_index, assignee_index = self._state_index, self._assignee_index
+        fromisoformat = datetime.fromisoformat
+        effort_key, points_key = EFFORT_FIELDS
+        for wi in items or ():
+            if not isinstance(wi, dict):
+                continue
+            fields = wi.get("fields") or {}
+            get = fields.get
+            wi_id = get("System.Id")
+            if wi_id is None:
+                wi_id = wi.get("id")
+            if wi_id.__class__ is int:
+                ids(wi_id)
+            else:
+                ids(int(wi_id) if isinstance(wi_id, str) and wi_id.isdigit() else 0)
+            value = get(effort_key)
+            if value.__class__ is not float and value.__class__ is not int:
+                value = get(points_key)
+                if value.__class__ is not float and value.__class__ is not int:
+                    value = _effort(fields)
+            effort(value)
+
+            closed_at = get("Microsoft.VSTS.Common.ClosedDate")
+            if closed_at:
+                created_at = get("System.CreatedDate")
+                # Inlined parse_epoch for the usual aware 'Z' timestamps; anything else takes the slow path
+                try:
+                    end, start = fromisoformat(closed_at), fromisoformat(created_at)
+                    if end.tzinfo is None or start.tzinfo is None:
+                        raise ValueError("naive timestamp")
+                    end, start = end.timestamp(), start.timestamp()
+                except (TypeError, ValueError):
+                    end, start = parse_epoch(closed_at), parse_epoch(created_at)
+                closed(end)
+                created(start)
+            else:
+                closed(NAN)
+                created(NAN)
+
+            state = get("System.State")
+            code = state_index.get(state)
+            if code is None:
+                state = str(state or "")
+                code = state_index.get(state)
+                if code is None:
+                    code = state_index[state] = len(self.states)
+                    self.states.append(sys.intern(state))
+            state_codes(code)
+
+            assignee = get("System.AssignedTo")
+            name = assignee.get("displayName") if isinstance(assignee, dict) else assignee
+            code = assignee_index.get(name) if isinstance(name, str) else None
+            if code is None:
+                name = _assignee_name(assignee)
+                code = assignee_index.get(name)
+                if code is None:
+                    code = assignee_index[name] = len(self.assignees)
+                    self.assignees.append(sys.intern(name))
+            assignee_codes(code)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def take(self, rows: Iterable[int]) -> "WorkItemFrame":
+        """New frame holding the given row positions, sharing category tables."""
+        out = WorkItemFrame(self.states, self.assignees)
+        rows = list(rows)
+        for name in ("ids", "effort", "created", "closed", "state_codes", "assignee_codes"):
+            column = getattr(self, name)
+            setattr(out, name, array(column.typecode, [column[i] for i in rows]))
+        return out
+
+    def filter_states(self, states: Iterable[str]) -> "WorkItemFrame":
+        """Rows whose state (case-insensitive) is in `states`."""
+        wanted = {s.lower() for s in states}
+        codes = {i for i, s in enumerate(self.states) if s.lower() in wanted}
+        return self.take(i for i, c in enumerate(self.state_codes) if c in codes)
+
+    def completed(self) -> "WorkItemFrame":
+        return self.filter_states(COMPLETED_STATES)
+
+    def state_counts(self) -> dict[str, int]:
+        counts = Counter(self.state_codes)
+        return {self.states[code]: n for code, n in counts.items()}
+
+    def effort_total(self) -> float:
+        return math.fsum(self.effort)
+
+    def load_by_assignee(self) -> dict[str, float]:
+        """Summed effort per assignee, in order of first appearance."""
+        totals: dict[int, float] = {}
+        for code, effort in zip(self.assignee_codes, self.effort):
+            totals[code] = totals.get(code, 0.0) + effort
+        return {self.assignees[code]: total for code, total in totals.items()}
+
+    def cycle_times_hours(self) -> list[float]:
+        """Created -> closed duration in hours for rows that have both timestamps."""
+        return [
+            (end - start) / 3600
+            for start, end in zip(self.created, self.closed)
+            if not (math.isnan(start) or math.isnan(end))
+        ]
+
+    def cycle_time_percentiles(self, percentiles=(50, 85, 95)) -> dict[str, float]:
+        values = sorted(self.cycle_times_hours())
+        return {f"p{p}": round(_percentile(values, p), 1) for p in percentiles}
+
+    def closed_by_week(self) -> Counter:
+        """Count of closed rows per ISO (year, week)."""
+        weeks = Counter()
+        for ts in self.closed:
+            if math.isnan(ts):
+                continue
+            year, week, _ = datetime.fromtimestamp(ts, timezone.utc).isocalendar()
+            weeks[(year, week)] += 1
+        return weeks
+
+    def closed_effort_by_day(self) -> list[tuple[date, float]]:
+        """(UTC close date, effort) pairs sorted by date, for rows with a closed timestamp."""
+        pairs = [
+            (datetime.fromtimestamp(ts, timezone.utc).date(), effort)
+            for ts, effort in zip(self.closed, self.effort)
+            if not math.isnan(ts)
+        ]
+        pairs.sort(key=lambda p: p[0])
+        return pairs
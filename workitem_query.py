@@ -0,0 +1,92 @@
+"""Push work-item filtering and field projection down to Azure DevOps.
+
+Analytics only read a handful of fields. Fetching full work-item documents (descriptions,
+history, links, relations) for every ID of an iteration costs far more transfer and JSON
+parsing than the numbers need. This module builds WIQL so the server does the filtering,
+e.g. "completed items in this iteration". It also fixes the field lists that batch
+fetches ask for.
+
+WIQL here is project-scoped: it does not know which area paths belong to a team. Callers
+intersect its IDs with the team's iteration query, which is cheap because it returns IDs only.
+"""
+from typing import Iterable, Optional
+
+from workitem_frame import COMPLETED_STATES, EFFORT_FIELDS
+
+WIQL_TOOL = "wit_query_by_wiql"
+
+# Everything WorkItemFrame reads
+FRAME_FIELDS = (
+    "System.Id",
+    "System.State",
+    "System.AssignedTo",
+    "System.CreatedDate",
+    "Microsoft.VSTS.Common.ClosedDate",
+    *EFFORT_FIELDS,
+)
+
+# Everything a listing row (fastapi_app.work_item_row) shows
+ROW_FIELDS = FRAME_FIELDS + (
+    "System.Title",
+    "System.WorkItemType",
+    "System.IterationPath",
+)
+
+
+def wiql_literal(value) -> str:
+    """Quote a value for WIQL (single quotes doubled)."""
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def iteration_wiql_path(node_path: Optional[str]) -> Optional[str]:
+    """WIQL iteration path from a classification-node path.
+
+    work_list_iterations reports `\\Project\\Iteration\\Sprint 1`, while WIQL compares
+    `System.IterationPath` against `Project\\Sprint 1`.
+    """
+    if not node_path:
+        return None
+    parts = [p for p in str(node_path).split("\\") if p]
+    if len(parts) > 1 and parts[1].lower() == "iteration":
+        del parts[1]
+    return "\\".join(parts) or None
+
+
+def build_wiql(project: str, iteration_path: Optional[str] = None, states: Optional[Iterable[str]] = None,
+               include_child_iterations: bool = False) -> str:
+    """`SELECT [System.Id]` WIQL for a project, optionally narrowed by iteration and state.
+
+    The iteration matches exactly, like the team iteration query, unless `include_child_iterations`.
+    """
+    clauses = [f"[System.TeamProject] = {wiql_literal(project)}"]
+    if iteration_path:
+        op = "UNDER" if include_child_iterations else "="
+        clauses.append(f"[System.IterationPath] {op} {wiql_literal(iteration_path)}")
+    if states:
+        # WIQL string comparison is case-insensitive, matching WorkItemFrame.filter_states
+        clauses.append(f"[System.State] IN ({', '.join(wiql_literal(s) for s in sorted(states))})")
+    return "SELECT [System.Id] FROM WorkItems WHERE " + " AND ".join(clauses) + " ORDER BY [System.Id]"
+
+
+def completed_wiql(project: str, iteration_path: str) -> str:
+    return build_wiql(project, iteration_path, states=[s.title() for s in COMPLETED_STATES])
+
+
+def wiql_ids(result) -> list[int]:
+    """Work-item IDs from a WIQL result ({"workItems": [{"id": ...}]} or a bare list)."""
+    if isinstance(result, dict):
+        result = result.get("workItems") or result.get("value") or []
+    ids = []
+    for ref in result or []:
+        wi_id = ref.get("id") if isinstance(ref, dict) else ref
+        if isinstance(wi_id, int) or (isinstance(wi_id, str) and wi_id.isdigit()):
+            ids.append(int(wi_id))
+    return ids
+
+
+async def query_ids(session, extract_json, project: str, wiql: str) -> list[int]:
+    """Run a WIQL query through the MCP server and return the matching IDs."""
+    resp = await session.call_tool(WIQL_TOOL, {"project": project, "wiql": wiql})
+    if getattr(resp, "isError", False):
+        raise RuntimeError(f"WIQL query failed: {extract_json(resp.content)}")
+    return wiql_ids(extract_json(resp.content))